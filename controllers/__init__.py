@@ -1,3 +1,4 @@
 from .contact_controller import ContactController
+from .campaign_scheduler import CampaignScheduler
 
-__all__ = ['ContactController']
\ No newline at end of file
+__all__ = ['ContactController', 'CampaignScheduler']
\ No newline at end of file
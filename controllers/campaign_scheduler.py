@@ -0,0 +1,221 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional, List
+from models.contact import Contact
+from controllers.contact_controller import ContactController, EndReason
+from controllers.services.job_queue import JobQueue, CampaignJob, JobStatus
+from utils.logger import get_logger
+
+SOURCE = "CampaignScheduler"
+
+class CampaignScheduler:
+    POLL_INTERVAL = 5        # Segundos entre verificações da fila
+    LOGIN_TIMEOUT = 150      # Tempo máximo à espera do login do WhatsApp
+    INIT_RETRY_INTERVAL = 300  # Evita relançar o navegador a cada verificação
+    ERROR_RETRY_DELAY = 15 * 60  # Campanha que terminou com erro volta a ser tentada depois disto
+
+    def __init__(self, controller: ContactController, queue: JobQueue):
+        self.controller = controller
+        self.queue = queue
+        self.logger = get_logger()
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._active_job_id: Optional[int] = None
+        self._pausing = False
+        self._next_init_attempt = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name="CampaignScheduler", daemon=True)
+        self._thread.start()
+        self.logger.debug("Scheduler de campanhas iniciado", source=SOURCE)
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=self.POLL_INTERVAL + 1)
+            self._thread = None
+
+    def enqueue(
+        self,
+        method: str,
+        contacts: List[Contact],
+        message_template: str,
+        welcome_template: str = "",
+        delay: int = 3,
+        check_stop_response: bool = True,
+        daily_cap: Optional[int] = None,
+        window_start: str = "",
+        window_end: str = "",
+        not_before: str = ""
+    ) -> int:
+        job = CampaignJob(
+            method=method,
+            contact_phones=[c.telemovel for c in contacts],
+            message_template=message_template,
+            welcome_template=welcome_template,
+            delay=delay,
+            check_stop_response=check_stop_response,
+            daily_cap=daily_cap,
+            window_start=window_start,
+            window_end=window_end,
+            not_before=not_before
+        )
+        return self.queue.enqueue(job)
+
+    def _loop(self):
+        while not self._stop_event.is_set():
+            try:
+                self._tick()
+            except Exception as e:
+                self.logger.error("Erro no scheduler de campanhas", error=e, source=SOURCE)
+            self._stop_event.wait(self.POLL_INTERVAL)
+
+    def _tick(self):
+        if self.controller.is_sending:
+            self._check_window_end()
+            return
+
+        if self._active_job_id is not None:
+            self._finish_active_job()
+
+        job = self.queue.head()
+        if job is None or not job.in_window():
+            return
+
+        if not self._ensure_sender(job.method):
+            return
+
+        if job.status in (JobStatus.RUNNING, JobStatus.PAUSED):
+            self._resume_job(job)
+        else:
+            self._start_job(job)
+
+    def _check_window_end(self):
+        # Campanha do scheduler a correr fora da janela: para no próximo ponto seguro
+        if self._active_job_id is None or self._pausing:
+            return
+        job = self.queue.get(self._active_job_id)
+        if job and not job.in_window():
+            self.logger.info(f"Campanha #{job.id}: fim da janela horária, a pausar", source=SOURCE)
+            self._pausing = True
+            self.controller.stop_sending()
+
+    def _finish_active_job(self):
+        job_id = self._active_job_id
+        self._active_job_id = None
+        pending = self.controller.get_pending_campaign(job_id)
+        end_reason = self.controller.last_end_reason
+
+        if end_reason == EndReason.FINISHED:
+            self.queue.mark_done(job_id)
+            self.logger.info(f"Campanha #{job_id} concluída", source=SOURCE)
+            self._pausing = False
+            return
+        if end_reason == EndReason.STOPPED and not self._pausing:
+            # Paragem manual: a campanha agendada termina aqui e não retoma sozinha
+            self.queue.mark_failed(job_id, end_reason)
+            self.controller.discard_pending_campaign(job_id)
+            self._pausing = False
+            return
+
+        if self._pausing:
+            # Fim da janela horária: continua quando a janela voltar a abrir
+            not_before = ""
+        elif end_reason == EndReason.DAILY_CAP:
+            # Limite diário atingido: retoma a partir do dia seguinte
+            tomorrow = (datetime.now() + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+            not_before = tomorrow.isoformat(timespec="seconds")
+            self.logger.info(f"Campanha #{job_id} adiada para {tomorrow:%d/%m %H:%M}", source=SOURCE)
+        else:
+            # Erro (inclui as verificações antes do envio): volta a tentar mais tarde
+            retry_at = datetime.now() + timedelta(seconds=self.ERROR_RETRY_DELAY)
+            not_before = retry_at.isoformat(timespec="seconds")
+            self.logger.warning(
+                f"Campanha #{job_id}: {end_reason or EndReason.ERROR}, nova tentativa às {retry_at:%H:%M}",
+                source=SOURCE
+            )
+
+        if pending is None:
+            # Nada foi enviado (sem checkpoint): recomeça do início, com novas verificações
+            self.queue.requeue(job_id, not_before)
+        else:
+            # Retoma pelo checkpoint, sem repetir envios
+            self.queue.defer(job_id, not_before)
+
+        self._pausing = False
+
+    def _ensure_sender(self, method: str) -> bool:
+        is_valid, error_msg = self.controller.validate_sender(method)
+        if is_valid:
+            return True
+
+        # Só o WhatsApp pode ser inicializado sem interação (o SMS precisa da janela de ADB)
+        if method != "whatsapp" or time.monotonic() < self._next_init_attempt:
+            return False
+
+        self._next_init_attempt = time.monotonic() + self.INIT_RETRY_INTERVAL
+        self.logger.info("Scheduler: a inicializar o WhatsApp para a próxima campanha...", source=SOURCE)
+        self.controller.initialize_sender(method)
+
+        deadline = time.monotonic() + self.LOGIN_TIMEOUT
+        while time.monotonic() < deadline and not self._stop_event.is_set():
+            if self.controller.validate_sender(method)[0]:
+                return True
+            self._stop_event.wait(2)
+
+        self.logger.warning(f"Scheduler: sender indisponível - {error_msg}", source=SOURCE)
+        return False
+
+    def _start_job(self, job: CampaignJob):
+        by_phone = {c.telemovel: c for c in self.controller.contacts}
+        contacts = [by_phone[p] for p in job.contact_phones if p in by_phone]
+
+        if not contacts:
+            self.queue.mark_failed(job.id, "Nenhum dos contactos da campanha está carregado")
+            self.logger.error(f"Campanha #{job.id}: contactos não encontrados", source=SOURCE)
+            return
+
+        missing = len(job.contact_phones) - len(contacts)
+        if missing:
+            self.logger.warning(f"Campanha #{job.id}: {missing} contacto(s) já não existem", source=SOURCE)
+
+        self.logger.info(f"A iniciar campanha agendada #{job.id} ({len(contacts)} contactos)", source=SOURCE)
+        started = self.controller.start_sending(
+            method=job.method,
+            contacts=contacts,
+            message_template=job.message_template,
+            welcome_template=job.welcome_template,
+            delay=job.delay,
+            check_stop_response=job.check_stop_response,
+            daily_cap=job.daily_cap,
+            job_id=job.id
+        )
+        if started:
+            self.queue.mark_running(job.id)
+            self._active_job_id = job.id
+        else:
+            self.queue.mark_failed(job.id, "Não foi possível iniciar o envio")
+
+    def _resume_job(self, job: CampaignJob):
+        if self.controller.get_pending_campaign(job.id) is None:
+            if self.controller.campaign_started(job.id):
+                # Terminou antes de a aplicação fechar, só faltou registar
+                self.queue.mark_done(job.id)
+            else:
+                # Interrompida antes do primeiro envio (ex: durante as verificações): começa do início
+                self._start_job(job)
+            return
+
+        self.logger.info(f"A retomar campanha agendada #{job.id}", source=SOURCE)
+        if self.controller.resume_campaign(job.id):
+            self.queue.mark_running(job.id)
+            self._active_job_id = job.id
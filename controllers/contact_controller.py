@@ -1,20 +1,72 @@
-from typing import List, Optional, Callable, Tuple
+from typing import List, Optional, Callable, Tuple, Dict
 from datetime import datetime
+from dataclasses import dataclass, field
+import asyncio
 import threading
+import time
 from pathlib import Path
 
 from models.contact import Contact, SendStatus
 from models.Result import Result, statusType, messageType
 from controllers.services.whatsapp_sender import WhatsAppSender
 from controllers.services.contact_service import ContactService
+from controllers.services.send_pacer import SendPacer
+from controllers.services.send_engine import AsyncSendEngine, SenderStalledError
+from controllers.services.checkpoint_service import CampaignCheckpoint, CheckpointStage
+from controllers.services.preflight_service import PreflightService, SendPlan, ExclusionReason, phone_key
+from controllers.services.invalid_number_cache import InvalidNumberCache
+from controllers.services.session_manager import WhatsAppSessionManager
+from controllers.services.browser_watchdog import BrowserWatchdog
 from utils.logger import get_logger
+from utils.environment import get_base_dir
 
 SOURCE = "ContactController"
 
+@dataclass
+class PreparedContact:
+    contact: Contact
+    can_send: bool
+    reason: str = ""
+    stop_response: bool = False
+    welcome_msg: Optional[str] = None
+    general_msg: Optional[str] = None
+
+class EndReason:
+    FINISHED = "Concluída"
+    STOPPED = "Interrompida pelo utilizador"
+    DAILY_CAP = "Limite diário atingido"
+    ERROR = "Terminou com erro"
+
+@dataclass
+class SendRun:
+    total: int
+    sent: int = 0
+    failed: int = 0
+    reports: List[Result] = field(default_factory=list)
+    finished: bool = False  # True se todos os contactos foram processados
+    # Resultados à espera de confirmações de entrega/leitura (id da mensagem -> Result)
+    tracked: Dict[str, Result] = field(default_factory=dict)
+    plan: Optional[SendPlan] = None  # Verificações feitas antes do primeiro envio
+    end_reason: str = ""  # Motivo de paragem antecipada registado pelo ciclo (ex: limite diário)
+
 class ContactController:
+    # Prazos das chamadas ao sender (segundos)
+    SEND_TIMEOUT = 60
+    OPT_OUT_TIMEOUT = 30
+    RECYCLE_TIMEOUT = 180
+    PLAN_TIMEOUT = 60
+    SCAN_TIMEOUT = 150
+    VALIDATE_TIMEOUT = 240  # Por lote de VALIDATE_BATCH números
+    VALIDATE_BATCH = 100
+    # Espera, no fim da campanha, pela chamada que ainda ocupa o sender antes de o libertar
+    WORKER_DRAIN_TIMEOUT = 60
+    # Intervalo mínimo entre recolhas dos PARAR recebidos por eventos (segundos)
+    OPT_OUT_POLL_INTERVAL = 5
+    
     def __init__(self):
         self._is_sending = False
         self._stop_requested = False
+        self._last_end_reason = ""
         self._session_send_count = 0
         
         # Logger centralizado
@@ -25,11 +77,17 @@ class ContactController:
         self._on_send_progress: Optional[Callable] = None
         self._on_send_complete: Optional[Callable] = None
         self._on_log: Optional[Callable] = None
+        self._on_pacing_update: Optional[Callable] = None
         
         # Serviços (injetados)
         self._contact_service: Optional[ContactService] = None
         self._sender = None
         self._message_service = None
+        self._engine: Optional[AsyncSendEngine] = None
+        
+        # Mantém o navegador do WhatsApp aberto entre campanhas
+        self._session = WhatsAppSessionManager()
+        self._session_healthy = True  # Resultado da verificação ao adquirir a sessão
     
     @property
     def contacts(self) -> List[Contact]:
@@ -47,6 +105,15 @@ class ContactController:
     def is_sending(self) -> bool:
         return self._is_sending
     
+    @property
+    def stop_requested(self) -> bool:
+        return self._stop_requested
+    
+    @property
+    def last_end_reason(self) -> str:
+        # Como terminou o último envio (EndReason); vazio enquanto nenhum terminou
+        return self._last_end_reason
+    
     @property
     def session_send_count(self) -> int:
         return self._session_send_count
@@ -60,17 +127,22 @@ class ContactController:
     def set_message_service(self, service):
         self._message_service = service
     
+    def set_session_idle_timeout(self, seconds: float):
+        self._session.set_idle_timeout(seconds)
+    
     def set_callbacks(
         self,
         on_contacts_changed: Optional[Callable] = None,
         on_send_progress: Optional[Callable] = None,
         on_send_complete: Optional[Callable] = None,
-        on_log: Optional[Callable] = None
+        on_log: Optional[Callable] = None,
+        on_pacing_update: Optional[Callable] = None
     ):
         self._on_contacts_changed = on_contacts_changed
         self._on_send_progress = on_send_progress
         self._on_send_complete = on_send_complete
         self._on_log = on_log
+        self._on_pacing_update = on_pacing_update
         
     def load_from_json(self, path: str) -> bool:
         if not self._contact_service:
@@ -211,21 +283,24 @@ class ContactController:
         message_template: str,
         welcome_template: str = "",
         delay: int = 3,
-        check_stop_response: bool = True
-    ):
+        check_stop_response: bool = True,
+        daily_cap: Optional[int] = None,
+        plan: Optional[SendPlan] = None,
+        job_id: Optional[int] = None
+    ) -> bool:
         if self._is_sending:
             self.logger.warning("Já existe um envio em progresso", source=SOURCE)
-            return
+            return False
         
         if not self._sender:
             self.logger.error("Serviço de envio não configurado", source=SOURCE)
-            return
+            return False
         
         # Valida sender
         is_valid, error_msg = self.validate_sender(method)
         if not is_valid:
             self.logger.error(f"Erro: {error_msg}", source=SOURCE)
-            return
+            return False
         
         # Valida templates se message_service disponível
         if self._message_service:
@@ -235,22 +310,32 @@ class ContactController:
             )
             if not valid:
                 self.logger.error(f"Erro: {error_msg}", source=SOURCE)
-                return
+                return False
         
         if not contacts:
             self.logger.warning("Nenhum contacto para enviar", source=SOURCE)
-            return
+            return False
+        
+        # Campanhas agendadas têm checkpoint próprio: não se misturam com as manuais
+        checkpoint_dir = self._checkpoint_dir(job_id)
+        if CampaignCheckpoint.exists(checkpoint_dir):
+            self.logger.warning("A campanha pendente anterior será substituída", source=SOURCE)
+            self._discard_checkpoint(checkpoint_dir)
         
+        self._acquire_session()
         self._is_sending = True
         self._stop_requested = False
+        self._last_end_reason = ""
         
         # Inicia thread de envio com lógica integrada (não precisa mais do coordinator)
         thread = threading.Thread(
             target=self._send_with_coordinator,
-            args=(contacts, message_template, welcome_template, delay, check_stop_response),
+            args=(contacts, message_template, welcome_template, delay, check_stop_response, daily_cap),
+            kwargs={"plan": plan, "checkpoint_dir": checkpoint_dir},
             daemon=True
         )
         thread.start()
+        return True
     
     def _send_with_coordinator(
         self,
@@ -258,24 +343,212 @@ class ContactController:
         message_template: str,
         welcome_template: str,
         delay: int,
-        check_stop_response: bool
+        check_stop_response: bool,
+        daily_cap: Optional[int] = None,
+        checkpoint: Optional[CampaignCheckpoint] = None,
+        plan: Optional[SendPlan] = None,
+        checkpoint_dir: Optional[Path] = None
     ):
-        import time
-        
+        self._last_end_reason = EndReason.ERROR
         try:
-            total = len(contacts)
+            run = SendRun(total=len(contacts), plan=plan)
+            
+            self._engine = AsyncSendEngine()
+            if self._stop_requested:
+                self._engine.cancel()
+            
+            # Sessão que falhou a verificação ao adquirir: recupera-a antes de a usar, ou não começa
+            if not self._session_healthy:
+                self._engine.run(self._stage_recover_session())
+                if not self._session_healthy:
+                    self.logger.error("Sessão do WhatsApp indisponível: envio cancelado", source=SOURCE)
+                    if self._stop_requested:
+                        self._last_end_reason = EndReason.STOPPED
+                    self._notify_complete(0, 0, 0)
+                    return
+            
+            # Verificações por contacto feitas uma vez, antes do ciclo (não em retomas:
+            # os índices do checkpoint referem-se à lista original)
+            preflighted = checkpoint is None
+            if preflighted:
+                if not self._engine.run(self._preflight(run, contacts, check_stop_response)) or run.plan is None:
+                    self.logger.warning("Envio interrompido antes do primeiro envio", source=SOURCE)
+                    if self._stop_requested:
+                        self._last_end_reason = EndReason.STOPPED
+                    self._notify_complete(0, 0, 0)
+                    return
+                self._apply_send_plan(run.plan)
+                contacts = run.plan.to_send
+                run.total = len(contacts)
+            
+            total = run.total
             self.logger.info(f"Iniciando envio para {total} contactos...", source=SOURCE)
             self.logger.debug(f"Delay configurado: {delay}s entre mensagens", source=SOURCE)
             
             # Já há 3s de espera após o login, não precisa de mais delay aqui
             
-            sent = 0
-            failed = 0
-            reports: List[Result] = []
+            # Agenda os envios num relógio monotónico (o tempo de envio conta para o delay)
+            channel = "whatsapp" if isinstance(self._sender, WhatsAppSender) else "sms"
             
+            # Checkpoint em disco: permite retomar a campanha sem repetir envios
+            if checkpoint is None:
+                checkpoint = CampaignCheckpoint(checkpoint_dir or self._checkpoint_dir())
+                checkpoint.start(
+                    channel, contacts, message_template, welcome_template,
+                    delay, check_stop_response, daily_cap
+                )
+            else:
+                run.reports = checkpoint.results
+                run.tracked = {r.message_id: r for r in run.reports if r.message_id}
+                run.sent = sum(1 for r in run.reports if r.status == statusType.SUCCESS)
+                run.failed = len(run.reports) - run.sent
+            pacer = SendPacer(
+                channel,
+                interval=delay,
+                daily_cap=daily_cap,
+                state_file=get_base_dir() / "data" / "send_counters.json"
+            )
+            self.logger.debug(
+                f"Ritmo: 1 mensagem a cada {pacer.interval:.1f}s (limite diário: {pacer.profile.daily_cap or 'sem limite'})",
+                source=SOURCE
+            )
+            
+            # Vigia a memória do navegador e recicla a página entre contactos se necessário
+            watchdog = BrowserWatchdog.from_config(self._sender) if isinstance(self._sender, WhatsAppSender) else None
+            
+            completed = self._engine.run(self._send_loop(
+                run, contacts, message_template, welcome_template, check_stop_response, pacer, checkpoint,
+                preflighted, watchdog
+            ))
+            if not completed:
+                self.logger.warning("Envio interrompido pelo utilizador", source=SOURCE)
+            self._wait_sender_idle(self._engine)
+            
+            if run.finished:
+                self._last_end_reason = EndReason.FINISHED
+            elif not completed or self._stop_requested:
+                self._last_end_reason = EndReason.STOPPED
+            else:
+                self._last_end_reason = run.end_reason or EndReason.ERROR
+            
+            if watchdog is not None:
+                stats = watchdog.get_stats()
+                self.logger.info(
+                    f"Navegador: {stats['recycles']} reciclagem(ns) em {stats['recycle_seconds']}s, "
+                    f"pico RSS {stats['peak_rss_mb']}MB, pico heap {stats['peak_heap_mb']}MB",
+                    source=SOURCE
+                )
+            
+            if run.finished:
+                checkpoint.finish()
+            else:
+                self.logger.info("Campanha incompleta: pode ser retomada mais tarde", source=SOURCE)
+            
+            # Salva contactos
+            self.logger.debug("Salvando contactos...", source=SOURCE)
+            self._auto_save()
+            
+            # Gera relatório se tiver reports
+            if run.reports:
+                self._generate_report(run.reports)
+            
+            self._notify_complete(run.sent, run.failed, total)
+            self._notify_contacts_changed()
+                    
+        except Exception as e:
+            self.logger.error(f"Erro crítico no envio", error=e, source=SOURCE)
+        finally:
+            # O envio só termina quando o sender deixa de ser usado pelo worker
+            if self._engine is not None:
+                self._wait_sender_idle(self._engine)
+            self._engine = None
+            self._is_sending = False
+            
+            self.logger.debug("Finalizando processo de envio...", source=SOURCE)
+            # O WhatsApp fica aberto para a próxima campanha (fecha por inatividade)
+            if isinstance(self._sender, WhatsAppSender):
+                self._session.release()
+    
+    def _wait_sender_idle(self, engine: AsyncSendEngine):
+        # Uma chamada que excedeu o prazo (ou foi interrompida pelo Parar) continua no worker
+        if engine.wait_idle(self.WORKER_DRAIN_TIMEOUT):
+            return
+        
+        self.logger.error(
+            f"O sender não terminou a última chamada em {self.WORKER_DRAIN_TIMEOUT}s: a fechar para o libertar",
+            source=SOURCE
+        )
+        close = getattr(self._sender, 'close', None)
+        if callable(close):
+            try:
+                close()
+            except Exception as e:
+                self.logger.error("Erro ao fechar o sender bloqueado", error=e, source=SOURCE)
+        if not engine.wait_idle(self.WORKER_DRAIN_TIMEOUT):
+            self.logger.error("O sender continua bloqueado", source=SOURCE)
+    
+    def _acquire_session(self):
+        if not isinstance(self._sender, WhatsAppSender):
+            self._session_healthy = True
+            return
+        healthy, reason = self._session.acquire(self._sender)
+        self._session_healthy = healthy
+        if healthy:
+            self.logger.debug("A reutilizar a sessão do WhatsApp", source=SOURCE)
+        else:
+            # A recuperação usa o navegador: é feita pelo motor, na thread de envio
+            self.logger.warning(f"Sessão do WhatsApp: {reason}", source=SOURCE)
+    
+    async def _stage_recover_session(self):
+        try:
+            await self._engine.call(self._recover_session, timeout=self.RECYCLE_TIMEOUT)
+        except (asyncio.TimeoutError, SenderStalledError):
+            self.logger.error(f"Recuperação da sessão excedeu {self.RECYCLE_TIMEOUT}s", source=SOURCE)
+    
+    def _recover_session(self):
+        # Navegador vivo: recarrega a página do WhatsApp; fechado não tem recuperação sem novo login
+        if getattr(self._sender, 'driver', None) is not None:
+            self.logger.info("A recuperar a sessão do WhatsApp...", source=SOURCE)
+            self._sender.recycle_page()
+        healthy, reason = self._session.check_health()
+        if not healthy:
+            self.logger.warning(f"Sessão do WhatsApp: {reason}", source=SOURCE)
+        self._session_healthy = healthy
+    
+    def shutdown(self, keep_browser: bool = False):
+        # Saída da aplicação: para o envio e fecha o navegador (ou deixa-o aberto para reutilizar)
+        if self._is_sending:
+            self.stop_sending()
+        self._session.shutdown(keep_browser)
+        if isinstance(self._sender, WhatsAppSender) and self._sender.driver is not None:
+            try:
+                if keep_browser:
+                    self._sender.release_browser()
+                else:
+                    self.logger.info("Encerrando WhatsApp...", source=SOURCE)
+                    self._sender.close()
+            except Exception as e:
+                self.logger.error(f"Erro ao encerrar WhatsApp", error=e, source=SOURCE)
+    
+    async def _send_loop(
+        self,
+        run: SendRun,
+        contacts: List[Contact],
+        message_template: str,
+        welcome_template: str,
+        check_stop_response: bool,
+        pacer: SendPacer,
+        checkpoint: CampaignCheckpoint,
+        preflighted: bool = False,
+        watchdog: Optional[BrowserWatchdog] = None
+    ):
+        total = run.total
+        slot_wait: Optional[asyncio.Future] = None
+        next_opt_out_poll = 0.0
+        
+        try:
             for i, contact in enumerate(contacts):
                 if self._stop_requested:
-                    self.logger.warning("Envio interrompido pelo utilizador", source=SOURCE)
                     break
                 
                 # Atualiza progresso
@@ -284,99 +557,450 @@ class ContactController:
                 
                 self.logger.debug(f"[{i+1}/{total}] Processando: {contact.nome}", source=SOURCE)
                 
+                # Trabalho já feito numa execução anterior (inclui envios interrompidos a meio)
+                stage = checkpoint.stage(i)
+                if stage in CampaignCheckpoint.FINISHED_STAGES:
+                    self.logger.debug(f"{contact.nome}: já processado ({stage})", source=SOURCE)
+                    continue
+                welcome_done = stage in CampaignCheckpoint.WELCOME_STAGES
+                
+                # A espera pelo slot corre enquanto o contacto é preparado; é cancelada se for saltado
+                if slot_wait is not None:
+                    slot_wait.cancel()
+                slot_wait = asyncio.ensure_future(self._engine.sleep(0 if pacer.cap_reached() else pacer.time_until_next_slot()))
+                
+                prepared = await self._prepare_contact(contact, message_template, welcome_template, check_stop_response, preflighted)
+                
+                # PARAR recebidos entretanto (eventos da página): os contactos são logo desativados
+                if time.monotonic() >= next_opt_out_poll:
+                    await self._stage_page_events(run, checkpoint)
+                    next_opt_out_poll = time.monotonic() + self.OPT_OUT_POLL_INTERVAL
+                if self._is_opted_out(contact):
+                    self.logger.warning(f"{contact.nome}: Pediu para parar durante a campanha", source=SOURCE)
+                    checkpoint.record(i, CheckpointStage.SKIPPED, contact)
+                    continue
+                
                 # Verifica se pode enviar
-                can_send, reason = contact.pode_receber_mensagem()
-                if not can_send:
-                    self.logger.warning(f"{contact.nome}: {reason}", source=SOURCE)
+                if not prepared.can_send:
+                    self.logger.warning(f"{contact.nome}: {prepared.reason}", source=SOURCE)
+                    checkpoint.record(i, CheckpointStage.SKIPPED, contact)
                     continue
                 
                 # Verifica resposta PARAR (se WhatsApp)
-                if check_stop_response and self._check_stop_response(contact):
+                if prepared.stop_response:
                     contact.registar_envio(SendStatus.DESELECTED)
                     contact.ativo = False  # Marca como inativo
                     self.logger.warning(f"{contact.nome}: Pediu para parar (marcado como inativo)", source=SOURCE)
+                    checkpoint.record(i, CheckpointStage.SKIPPED, contact)
                     continue
                 
-                self.logger.debug(f"Preparando mensagens para {contact.nome}...", source=SOURCE)
+                await slot_wait
+                slot_wait = None
+                cap_reached = False
                 
-                # Prepara mensagens usando message_service
-                if self._message_service:
-                    welcome_msg, general_msg = self._message_service.prepare_message(
-                        contact=contact,
-                        message_template=message_template,
-                        welcome_template=welcome_template,
-                        send_all_mode=True
-                    )
-                else:
-                    # Fallback sem message_service
-                    welcome_msg = welcome_template.replace("{nome}", contact.nome) if welcome_template else None
-                    general_msg = message_template.replace("{nome}", contact.nome) if message_template else None
-                
-                # ENVIO 1: Boas-vindas (se aplicável)
-                if welcome_msg:
-                    self.logger.info(f"[{i+1}/{total}] {contact.nome}: Enviando boas-vindas...", source=SOURCE)
-                    self.logger.debug(f"Mensagem boas-vindas: {welcome_msg[:50]}...", source=SOURCE)
+                # ENVIO 1: Boas-vindas (se aplicável), ENVIO 2: Mensagem geral
+                for message, msg_type in ((prepared.welcome_msg, messageType.WELCOME), (prepared.general_msg, messageType.GENERAL)):
+                    if not message:
+                        continue
+                    if msg_type == messageType.WELCOME and welcome_done:
+                        continue
                     
-                    result = self._send_message(contact, welcome_msg, messageType.WELCOME)
-                    reports.append(result)
+                    if pacer.cap_reached():
+                        self.logger.warning(
+                            f"Limite diário de {pacer.profile.daily_cap} mensagens atingido ({pacer.channel})",
+                            source=SOURCE
+                        )
+                        cap_reached = True
+                        run.end_reason = EndReason.DAILY_CAP
+                        break
                     
-                    if result.status == statusType.SUCCESS:
-                        sent += 1
-                        contact.registar_envio(SendStatus.SENT)
-                        self._session_send_count += 1
-                        self.logger.info(f"[{i+1}/{total}] {contact.nome}: ✓ Boas-vindas enviadas", source=SOURCE)
-                    else:
-                        failed += 1
-                        self.logger.error(f"[{i+1}/{total}] {contact.nome}: ✗ Erro ao enviar boas-vindas - {result.message}", source=SOURCE)
+                    # Espera cancelável até ao slot agendado
+                    await self._engine.sleep(pacer.time_until_next_slot())
                     
-                    self.logger.debug(f"Aguardando {delay}s antes da próxima mensagem...", source=SOURCE)
-                    time.sleep(delay)
-                
-                # ENVIO 2: Mensagem geral
-                if general_msg:
-                    self.logger.info(f"[{i+1}/{total}] {contact.nome}: Enviando mensagem geral...", source=SOURCE)
-                    self.logger.debug(f"Mensagem geral: {general_msg[:50]}...", source=SOURCE)
+                    label = "boas-vindas" if msg_type == messageType.WELCOME else "mensagem geral"
+                    self.logger.info(f"[{i+1}/{total}] {contact.nome}: Enviando {label}...", source=SOURCE)
+                    self.logger.debug(f"Mensagem {label}: {message[:50]}...", source=SOURCE)
                     
-                    result = self._send_message(contact, general_msg, messageType.GENERAL)
-                    reports.append(result)
+                    # Marca o envio como em curso antes de enviar: ao retomar nunca é repetido
+                    is_welcome = msg_type == messageType.WELCOME
+                    checkpoint.record(i, CheckpointStage.WELCOME_SENDING if is_welcome else CheckpointStage.GENERAL_SENDING, contact)
                     
-                    if result.status == statusType.SUCCESS:
-                        sent += 1
-                        contact.registar_envio(SendStatus.SENT)
-                        self._session_send_count += 1
-                        self.logger.info(f"[{i+1}/{total}] {contact.nome}: ✓ Mensagem enviada", source=SOURCE)
-                    else:
-                        failed += 1
-                        contact.registar_envio(SendStatus.FAILED)
-                        self.logger.error(f"[{i+1}/{total}] {contact.nome}: ✗ Erro ao enviar - {result.message}", source=SOURCE)
+                    pacer.mark_send()
+                    result = await self._stage_send(contact, message, msg_type)
+                    await self._stage_record(run, contact, result, i, total)
+                    checkpoint.record(i, CheckpointStage.WELCOME_DONE if is_welcome else CheckpointStage.DONE, contact, result)
+                    self._notify_pacing(pacer, i + 1, total)
                 
-                self.logger.debug(f"Aguardando {delay}s antes do próximo contacto...", source=SOURCE)
-                time.sleep(delay)
-            
-            # Salva contactos
-            self.logger.debug("Salvando contactos...", source=SOURCE)
-            self._auto_save()
-            
-            # Gera relatório se tiver reports
-            if reports:
-                self._generate_report(reports)
+                if cap_reached:
+                    break
+                
+                if checkpoint.stage(i) == CheckpointStage.WELCOME_DONE or not prepared.general_msg:
+                    checkpoint.record(i, CheckpointStage.DONE, contact)
+                
+                # Ponto seguro entre contactos: recicla a página se a memória passou do limite
+                if watchdog is not None and watchdog.due() and i + 1 < total:
+                    await self._stage_watchdog(watchdog)
+            else:
+                run.finished = not self._stop_requested
             
-            self._notify_complete(sent, failed, total)
-            self._notify_contacts_changed()
-                    
-        except Exception as e:
-            self.logger.error(f"Erro crítico no envio", error=e, source=SOURCE)
+            # Respostas e confirmações chegadas durante o último envio
+            await self._stage_page_events(run, checkpoint)
+        except SenderStalledError as e:
+            # Não há como continuar sem o sender: a campanha fica por retomar
+            self.logger.error(f"Envio interrompido: {e}", source=SOURCE)
         finally:
-            self._is_sending = False
-            
-            self.logger.debug("Finalizando processo de envio...", source=SOURCE)
-            # Cleanup do WhatsApp se estiver a usar
-            if isinstance(self._sender, WhatsAppSender):
+            if slot_wait is not None:
+                slot_wait.cancel()
+    
+    def get_invalid_number_cache(self) -> InvalidNumberCache:
+        # Usa a instância do sender quando existe, para ver as entradas desta sessão
+        cache = getattr(self._sender, 'invalid_numbers', None)
+        if isinstance(cache, InvalidNumberCache):
+            return cache
+        return InvalidNumberCache.load_default()
+    
+    def build_send_plan(self, contacts: List[Contact], check_stop_response: bool = True) -> SendPlan:
+        # Recolhe os conjuntos do sender uma vez; o resto são operações sobre a lista inteira
+        known_invalid = set(getattr(self._sender, 'invalid_numbers', None) or ())
+        
+        opted_out = set()
+        if check_stop_response:
+            get_responders = getattr(self._sender, 'get_stop_responders', None)
+            if callable(get_responders):
                 try:
-                    self.logger.info("Encerrando WhatsApp...", source=SOURCE)
-                    self._sender.close()
+                    opted_out = get_responders()
                 except Exception as e:
-                    self.logger.error(f"Erro ao encerrar WhatsApp", error=e, source=SOURCE)
+                    self.logger.error("Erro ao obter pedidos de paragem", error=e, source=SOURCE)
+        
+        return PreflightService.build_plan(contacts, known_invalid=known_invalid, opted_out=opted_out)
+    
+    async def _preflight(self, run: SendRun, contacts: List[Contact], check_stop_response: bool):
+        # O que usa o sender corre no motor: tem prazo e o Parar interrompe entre chamadas
+        try:
+            if run.plan is None:
+                run.plan = await self._engine.call(
+                    self.build_send_plan, contacts, check_stop_response, timeout=self.PLAN_TIMEOUT
+                )
+        except (asyncio.TimeoutError, SenderStalledError):
+            self.logger.error(f"Verificações antes do envio excederam {self.PLAN_TIMEOUT}s", source=SOURCE)
+            return
+        
+        plan = run.plan
+        try:
+            if check_stop_response:
+                try:
+                    await self._engine.call(self._scan_plan_opt_outs, plan, timeout=self.SCAN_TIMEOUT)
+                except asyncio.TimeoutError:
+                    self.logger.warning(f"Procura de pedidos de paragem excedeu {self.SCAN_TIMEOUT}s", source=SOURCE)
+            
+            # Em lotes: cada chamada tem um prazo curto e o Parar não espera pela lista inteira
+            pending = list(plan.to_send)
+            for start in range(0, len(pending), self.VALIDATE_BATCH):
+                batch = pending[start:start + self.VALIDATE_BATCH]
+                try:
+                    await self._engine.call(self._validate_plan_numbers, plan, batch, timeout=self.VALIDATE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    # Os restantes são verificados no envio
+                    self.logger.warning(f"Validação dos números excedeu {self.VALIDATE_TIMEOUT}s", source=SOURCE)
+                    break
+        except SenderStalledError as e:
+            self.logger.error(f"Verificações antes do envio interrompidas: {e}", source=SOURCE)
+    
+    def _scan_plan_opt_outs(self, plan: SendPlan):
+        # Procura em lote no WhatsApp quem já respondeu PARAR, antes do primeiro envio
+        scan = getattr(self._sender, 'scan_opt_outs', None)
+        if not callable(scan):
+            return
+        
+        try:
+            numbers = scan()
+        except Exception as e:
+            self.logger.error("Erro ao procurar pedidos de paragem", error=e, source=SOURCE)
+            return
+        if not numbers:
+            return
+        
+        # Os da campanha são desativados por _apply_send_plan; os restantes ficam já inativos
+        stopped = [c for c in plan.to_send if phone_key(c.telemovel) in numbers]
+        plan.exclude(stopped, ExclusionReason.OPTED_OUT)
+        stopped_ids = {id(c) for c in stopped}
+        others = [
+            c for c in self.contacts
+            if c.ativo and id(c) not in stopped_ids and phone_key(c.telemovel) in numbers
+        ]
+        self._deactivate_opted_out(others)
+    
+    def _validate_plan_numbers(self, plan: SendPlan, contacts: List[Contact]):
+        # Verifica no WhatsApp, de uma vez, se os números a enviar existem
+        validate = getattr(self._sender, 'validate_numbers', None)
+        if not callable(validate) or not contacts:
+            return
+        
+        try:
+            results = validate([c.telemovel for c in contacts])
+        except Exception as e:
+            self.logger.error("Erro na validação dos números", error=e, source=SOURCE)
+            return
+        
+        # Sem resposta (None) não é prova de número inválido: o envio volta a verificar
+        invalid = [c for c in contacts if results.get(phone_key(c.telemovel)) is False]
+        for contact in invalid:
+            contact.is_valid = False
+        plan.exclude(invalid, ExclusionReason.NO_WHATSAPP)
+        
+        if invalid:
+            self._notify_contacts_changed()
+    
+    def _apply_send_plan(self, plan: SendPlan):
+        if not plan.excluded:
+            return
+        
+        for contact in plan.opted_out:
+            contact.registar_envio(SendStatus.DESELECTED)
+            contact.ativo = False  # Marca como inativo
+            self.logger.warning(f"{contact.nome}: Pediu para parar (marcado como inativo)", source=SOURCE)
+        
+        for reason, count in plan.reason_counts().items():
+            self.logger.info(f"Excluídos antes do envio - {reason}: {count}", source=SOURCE)
+        
+        if plan.opted_out:
+            self._notify_contacts_changed()
+    
+    def _checkpoint_dir(self, job_id: Optional[int] = None) -> Path:
+        # Sem job_id: a campanha manual; cada campanha agendada tem a sua pasta
+        if job_id is None:
+            return get_base_dir() / "data" / "campaign"
+        return get_base_dir() / "data" / "campaign_jobs" / str(job_id)
+    
+    def campaign_started(self, job_id: int) -> bool:
+        # A pasta do checkpoint fica depois de concluída ou descartada: só falta se nunca houve envios
+        return self._checkpoint_dir(job_id).exists()
+    
+    def get_pending_campaign(self, job_id: Optional[int] = None) -> Optional[dict]:
+        checkpoint = CampaignCheckpoint.load(self._checkpoint_dir(job_id))
+        if checkpoint is None:
+            return None
+        return checkpoint.summary()
+    
+    def discard_pending_campaign(self, job_id: Optional[int] = None):
+        if self._discard_checkpoint(self._checkpoint_dir(job_id)):
+            self.logger.info("Campanha pendente descartada", source=SOURCE)
+    
+    def _discard_checkpoint(self, checkpoint_dir: Path) -> bool:
+        checkpoint = CampaignCheckpoint.load(checkpoint_dir)
+        if checkpoint is None:
+            return False
+        
+        # O journal é o único registo do que uma execução interrompida já enviou:
+        # passa-o aos contactos e grava-os antes de o apagar (evita repetir boas-vindas)
+        checkpoint.restore_contacts(self.contacts)
+        self._auto_save()
+        self._notify_contacts_changed()
+        checkpoint.finish()
+        return True
+    
+    def resume_campaign(self, job_id: Optional[int] = None) -> bool:
+        if self._is_sending:
+            self.logger.warning("Já existe um envio em progresso", source=SOURCE)
+            return False
+        
+        checkpoint = CampaignCheckpoint.load(self._checkpoint_dir(job_id))
+        if checkpoint is None:
+            self.logger.warning("Nenhuma campanha para retomar", source=SOURCE)
+            return False
+        
+        is_valid, error_msg = self.validate_sender(checkpoint.method)
+        if not is_valid:
+            self.logger.error(f"Erro: {error_msg}", source=SOURCE)
+            return False
+        
+        summary = checkpoint.summary()
+        self.logger.info(
+            f"A retomar campanha de {summary['created_at']}: {summary['pending']}/{summary['total']} contactos em falta",
+            source=SOURCE
+        )
+        
+        header = checkpoint.header
+        contacts = checkpoint.restore_contacts(self.contacts)
+        
+        self._acquire_session()
+        self._is_sending = True
+        self._stop_requested = False
+        self._last_end_reason = ""
+        
+        thread = threading.Thread(
+            target=self._send_with_coordinator,
+            args=(
+                contacts,
+                header.get("message_template", ""),
+                header.get("welcome_template", ""),
+                header.get("delay", 3),
+                header.get("check_stop_response", True),
+                header.get("daily_cap"),
+                checkpoint
+            ),
+            daemon=True
+        )
+        thread.start()
+        return True
+    
+    async def _prepare_contact(
+        self,
+        contact: Contact,
+        message_template: str,
+        welcome_template: str,
+        check_stop_response: bool,
+        preflighted: bool = False
+    ) -> PreparedContact:
+        reason = "OK"
+        if not preflighted:
+            can_send, reason = await self._stage_validate(contact)
+            if not can_send:
+                return PreparedContact(contact, can_send=False, reason=reason)
+            
+            if check_stop_response and await self._stage_opt_out(contact):
+                return PreparedContact(contact, can_send=True, reason=reason, stop_response=True)
+        
+        welcome_msg, general_msg = await self._stage_prepare(contact, message_template, welcome_template)
+        
+        return PreparedContact(
+            contact,
+            can_send=True,
+            reason=reason,
+            welcome_msg=welcome_msg,
+            general_msg=general_msg
+        )
+    
+    async def _stage_validate(self, contact: Contact) -> Tuple[bool, str]:
+        return contact.pode_receber_mensagem()
+    
+    async def _stage_opt_out(self, contact: Contact) -> bool:
+        try:
+            return await self._engine.call(self._check_stop_response, contact, timeout=self.OPT_OUT_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.logger.warning(f"{contact.nome}: Timeout ao verificar PARAR", source=SOURCE)
+            return False
+    
+    async def _stage_prepare(
+        self,
+        contact: Contact,
+        message_template: str,
+        welcome_template: str
+    ) -> Tuple[Optional[str], Optional[str]]:
+        # Prepara mensagens usando message_service
+        if self._message_service:
+            return self._message_service.prepare_message(
+                contact=contact,
+                message_template=message_template,
+                welcome_template=welcome_template,
+                send_all_mode=True
+            )
+        
+        # Fallback sem message_service
+        welcome_msg = welcome_template.replace("{nome}", contact.nome) if welcome_template else None
+        general_msg = message_template.replace("{nome}", contact.nome) if message_template else None
+        return welcome_msg, general_msg
+    
+    async def _stage_send(self, contact: Contact, message: str, msg_type: messageType) -> Result:
+        result = await self._stage_send_once(contact, message, msg_type)
+        if not getattr(self._sender, 'page_needs_recovery', False):
+            return result
+        
+        # A página perdeu a API antes de enviar: recupera numa chamada própria e repete com novo prazo
+        try:
+            recovered = await self._engine.call(self._sender.recover_page, timeout=self.RECYCLE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.logger.error(f"Recuperação da página excedeu {self.RECYCLE_TIMEOUT}s", source=SOURCE)
+            return result
+        # Após um erro do driver o envio pode ter saído: a página recupera, mas não se repete
+        if not recovered or not getattr(self._sender, 'send_retryable', False):
+            return result
+        return await self._stage_send_once(contact, message, msg_type)
+    
+    async def _stage_send_once(self, contact: Contact, message: str, msg_type: messageType) -> Result:
+        try:
+            return await self._engine.call(self._send_message, contact, message, msg_type, timeout=self.SEND_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.logger.error(f"{contact.nome}: Envio excedeu {self.SEND_TIMEOUT}s", source=SOURCE)
+            return Result(
+                contact_name=contact.nome,
+                contact_phone=contact.telemovel,
+                status=statusType.ERROR,
+                message=f"Timeout ({self.SEND_TIMEOUT}s)",
+                timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                message_type=msg_type
+            )
+    
+    async def _stage_page_events(self, run: SendRun, checkpoint: CampaignCheckpoint):
+        # Uma recolha traz os PARAR e as confirmações de entrega; o ciclo nunca espera por estas
+        try:
+            await self._engine.call(self._ingest_opt_outs, timeout=self.OPT_OUT_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.logger.warning("Timeout ao recolher pedidos de paragem", source=SOURCE)
+        self._ingest_acks(run, checkpoint)
+    
+    def _ingest_acks(self, run: SendRun, checkpoint: CampaignCheckpoint):
+        take = getattr(self._sender, 'take_acks', None)
+        if not callable(take) or not run.tracked:
+            return
+        changed: Dict[str, int] = {}
+        for message_id, ack in take().items():
+            result = run.tracked.get(message_id)
+            if result is not None and result.update_ack(ack):
+                changed[message_id] = result.ack
+        # Sem isto uma campanha retomada voltava a mostrar as mensagens como apenas enviadas
+        checkpoint.record_acks(changed)
+    
+    def _ingest_opt_outs(self) -> int:
+        poll = getattr(self._sender, 'poll_opt_outs', None)
+        if not callable(poll):
+            return 0
+        new_numbers = poll()
+        if not new_numbers:
+            return 0
+        
+        matched = [c for c in self.contacts if c.ativo and phone_key(c.telemovel) in new_numbers]
+        self._deactivate_opted_out(matched)
+        return len(matched)
+    
+    def _deactivate_opted_out(self, contacts: List[Contact]):
+        for contact in contacts:
+            contact.registar_envio(SendStatus.DESELECTED)
+            contact.ativo = False  # Marca como inativo
+            self.logger.warning(f"{contact.nome}: Respondeu PARAR (marcado como inativo)", source=SOURCE)
+        
+        if contacts:
+            self._notify_contacts_changed()
+    
+    def _is_opted_out(self, contact: Contact) -> bool:
+        opted_out = getattr(self._sender, 'opted_out_numbers', None)
+        return bool(opted_out) and phone_key(contact.telemovel) in opted_out
+    
+    async def _stage_watchdog(self, watchdog: BrowserWatchdog):
+        try:
+            await self._engine.call(watchdog.check_and_recycle, timeout=self.RECYCLE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.logger.error(f"Reciclagem do navegador excedeu {self.RECYCLE_TIMEOUT}s", source=SOURCE)
+    
+    async def _stage_record(self, run: SendRun, contact: Contact, result: Result, index: int, total: int):
+        run.reports.append(result)
+        if result.message_id:
+            run.tracked[result.message_id] = result
+        is_welcome = result.message_type == messageType.WELCOME
+        
+        if result.status == statusType.SUCCESS:
+            run.sent += 1
+            contact.registar_envio(SendStatus.SENT)
+            self._session_send_count += 1
+            done = "Boas-vindas enviadas" if is_welcome else "Mensagem enviada"
+            self.logger.info(f"[{index+1}/{total}] {contact.nome}: ✓ {done}", source=SOURCE)
+        else:
+            run.failed += 1
+            if is_welcome:
+                self.logger.error(f"[{index+1}/{total}] {contact.nome}: ✗ Erro ao enviar boas-vindas - {result.message}", source=SOURCE)
+            else:
+                contact.registar_envio(SendStatus.FAILED)
+                self.logger.error(f"[{index+1}/{total}] {contact.nome}: ✗ Erro ao enviar - {result.message}", source=SOURCE)
     
     def _generate_report(self, reports: List[Result]):
         from controllers.services.report_service import ReportGenerator
@@ -414,6 +1038,8 @@ class ContactController:
     
     def stop_sending(self):
         self._stop_requested = True
+        if self._engine is not None:
+            self._engine.cancel()
         self.logger.warning("Pedido de paragem recebido...", source=SOURCE)
     
     def _auto_save(self):
@@ -456,8 +1082,7 @@ class ContactController:
                     contact.is_valid = False
                     # Adiciona ao cache do WhatsAppSender se existir
                     if isinstance(self._sender, WhatsAppSender):
-                        phone_digits = ''.join(filter(str.isdigit, contact.telemovel))
-                        self._sender._invalid_numbers.add(phone_digits)
+                        self._sender.invalid_numbers.add(contact.telemovel)
                 
                 return result
 
@@ -489,6 +1114,15 @@ class ContactController:
         if self._on_send_progress:
             self._on_send_progress(progress, current, total)
     
+    def _notify_pacing(self, pacer: SendPacer, current: int, total: int):
+        if not self._on_pacing_update:
+            return
+        
+        # Estima os envios em falta pela média de mensagens por contacto até agora
+        per_contact = pacer.session_sends / current if current > 0 else 1
+        remaining_sends = int(round((total - current) * max(1.0, per_contact)))
+        self._on_pacing_update(pacer.get_stats(remaining_sends))
+    
     def _notify_complete(self, sent: int, failed: int, total: int):
         if self._on_send_complete:
             self._on_send_complete(sent, failed, total)
@@ -9,6 +9,7 @@ from typing import Optional, Callable, Tuple, List
 from dataclasses import dataclass
 from datetime import datetime
 from utils.logger import get_logger
+from controllers.services.adb_shell import AdbShellSession
 
 SOURCE = "ADB_Manager"
 
@@ -31,6 +32,9 @@ class ADB_Manager:
         self._on_device_connected: Optional[Callable[[DeviceInfo], None]] = None
         self._on_device_disconnected: Optional[Callable[[Optional[DeviceInfo]], None]] = None
         self._last_known_devices: set = set()
+        # Sessão 'adb shell' reutilizada pelos comandos de envio (um processo em vez de um por comando)
+        self._shell: Optional[AdbShellSession] = None
+        self._shell_lock = threading.Lock()
         
     def set_device_callbacks(
         self, 
@@ -145,6 +149,26 @@ class ADB_Manager:
             creationflags=self._get_creation_flags()
         )
 
+    def run_shell(self, *args, timeout: int = 30) -> subprocess.CompletedProcess:
+        # Mesmo resultado que run_adb("shell", ...): o adb também junta os argumentos com espaços
+        command = " ".join(args)
+        with self._shell_lock:
+            if self._shell is None or self._shell.device_id != self.device_id:
+                self._close_shell()
+                self._shell = AdbShellSession(self.adb_path, self.device_id, self._get_creation_flags())
+            shell = self._shell
+        try:
+            return shell.run(command, timeout=timeout)
+        except ConnectionError as e:
+            # Sem sessão persistente (ex: dispositivo a religar): recorre a um processo avulso
+            self.logger.debug(f"{e}, a usar processo avulso", source=SOURCE)
+            return self.run_adb("shell", command, timeout=timeout)
+
+    def _close_shell(self):
+        if self._shell is not None:
+            self._shell.close()
+            self._shell = None
+
     def get_connected_devices(self) -> List[Tuple[str, str]]:
         if not self.adb_path:
             return []
@@ -309,6 +333,8 @@ class ADB_Manager:
         self.logger.info(f"O dispositivo foi desconectado: {device_id}", source=SOURCE)
         
         if self.device_id == device_id:
+            with self._shell_lock:
+                self._close_shell()
             self.device_id = None
             self.device_connected = False
             old_info = self.device_info
@@ -356,3 +382,5 @@ class ADB_Manager:
 
     def close(self):
         self.stop_device_monitoring()
+        with self._shell_lock:
+            self._close_shell()
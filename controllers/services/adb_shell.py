@@ -0,0 +1,173 @@
+import os
+import subprocess
+import threading
+import time
+import uuid
+from typing import List, Optional
+from utils.logger import get_logger
+
+SOURCE = "AdbShell"
+
+class _StreamBuffer:
+    # Lê um pipe numa thread: o processo nunca bloqueia por buffer cheio
+    def __init__(self, stream):
+        self.data = bytearray()
+        self.closed = False
+        self.condition = threading.Condition()
+        self._thread = threading.Thread(target=self._read, args=(stream,), daemon=True)
+        self._thread.start()
+
+    def _read(self, stream):
+        fd = stream.fileno()
+        while True:
+            try:
+                chunk = os.read(fd, 65536)
+            except OSError:
+                chunk = b""
+            with self.condition:
+                if not chunk:
+                    self.closed = True
+                    self.condition.notify_all()
+                    return
+                self.data.extend(chunk)
+                self.condition.notify_all()
+
+    def wait_for(self, marker: bytes, deadline: float) -> int:
+        # Devolve a posição do marcador; -1 se o pipe fechou ou o prazo acabou
+        with self.condition:
+            while True:
+                index = self.data.find(marker)
+                if index != -1 or self.closed:
+                    return index
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return -1
+                self.condition.wait(remaining)
+
+    def take(self, end: int) -> bytes:
+        with self.condition:
+            chunk = bytes(self.data[:end])
+            del self.data[:end]
+            return chunk
+
+class AdbShellSession:
+    # Um único 'adb shell' para vários comandos; cada resposta termina num marcador com o código de saída
+    def __init__(self, adb_path: str, device_id: Optional[str] = None, creationflags: int = 0):
+        self.adb_path = adb_path
+        self.device_id = device_id
+        self.creationflags = creationflags
+        self.logger = get_logger()
+        self._process: Optional[subprocess.Popen] = None
+        self._stdout: Optional[_StreamBuffer] = None
+        self._stderr: Optional[_StreamBuffer] = None
+        self._token = uuid.uuid4().hex[:8]
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def start(self) -> bool:
+        self.close()
+        cmd: List[str] = [self.adb_path]
+        if self.device_id:
+            cmd.extend(["-s", self.device_id])
+        cmd.append("shell")
+        try:
+            self._process = subprocess.Popen(
+                cmd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                bufsize=0,
+                creationflags=self.creationflags
+            )
+        except Exception as e:
+            self.logger.warning(f"Não foi possível abrir sessão adb shell: {e}", source=SOURCE)
+            self._process = None
+            return False
+
+        self._stdout = _StreamBuffer(self._process.stdout)
+        self._stderr = _StreamBuffer(self._process.stderr)
+        self.logger.debug(f"Sessão adb shell aberta ({self.device_id or 'dispositivo padrão'})", source=SOURCE)
+        return True
+
+    def close(self):
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            if process.poll() is None:
+                process.stdin.write(b"exit\n")
+                process.stdin.flush()
+                process.wait(timeout=2)
+        except Exception:
+            pass
+        if process.poll() is None:
+            process.kill()
+        for stream in (process.stdin, process.stdout, process.stderr):
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+    def run(self, command: str, timeout: float = 30) -> subprocess.CompletedProcess:
+        with self._lock:
+            if not self.alive and not self.start():
+                raise ConnectionError("Sessão adb shell indisponível")
+
+            self._counter += 1
+            tag = f"__CM_{self._token}_{self._counter}"
+            end_marker = f"\n{tag}_END ".encode()
+            err_marker = f"{tag}_ERR\n".encode()
+
+            # Grupo { }: o </dev/null cobre pipelines e listas (;, &&) inteiras, não só o último
+            # comando; nenhum pode consumir os comandos seguintes do stdin
+            script = (
+                f"{{ {command}\n}} </dev/null\n"
+                f"__cm_rc=$?\n"
+                f"echo {tag}_ERR >&2\n"
+                f"printf '\\n{tag}_END %d\\n' $__cm_rc\n"
+            )
+            try:
+                self._process.stdin.write(script.encode("utf-8"))
+                self._process.stdin.flush()
+            except Exception as e:
+                self.close()
+                raise ConnectionError(f"Sessão adb shell terminou: {e}")
+
+            deadline = time.monotonic() + timeout
+            end = self._stdout.wait_for(end_marker, deadline)
+            if end == -1:
+                closed = self._stdout.closed
+                self.close()  # Estado desconhecido: a próxima chamada abre uma sessão nova
+                if closed:
+                    raise ConnectionError("Sessão adb shell terminou")
+                raise subprocess.TimeoutExpired(command, timeout)
+
+            stdout = self._stdout.take(end)
+            self._stdout.take(len(end_marker))
+            line_end = self._stdout.wait_for(b"\n", deadline)
+            tail = self._stdout.take(line_end + 1) if line_end != -1 else b""
+            try:
+                returncode = int(tail.decode().split()[-1])
+            except (ValueError, IndexError):
+                returncode = -1
+
+            # Dispositivos antigos (sem shell v2) juntam o stderr ao stdout
+            if err_marker in stdout:
+                stdout = stdout.replace(err_marker, b"", 1)
+                stderr = b""
+            else:
+                err_end = self._stderr.wait_for(err_marker, deadline)
+                stderr = self._stderr.take(err_end) if err_end != -1 else b""
+                if err_end != -1:
+                    self._stderr.take(len(err_marker))
+
+        return subprocess.CompletedProcess(
+            command,
+            returncode,
+            stdout.decode("utf-8", errors="ignore"),
+            stderr.decode("utf-8", errors="ignore")
+        )
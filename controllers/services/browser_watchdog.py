@@ -0,0 +1,107 @@
+import time
+from typing import Optional
+from utils.logger import get_logger
+from utils.environment import get_base_dir
+
+SOURCE = "BrowserWatchdog"
+
+class BrowserWatchdog:
+    DEFAULT_RSS_LIMIT_MB = 1500
+    DEFAULT_HEAP_LIMIT_MB = 700
+    CHECK_INTERVAL = 60  # Segundos entre amostras (a amostra em si é barata, mas usa o driver)
+
+    def __init__(
+        self,
+        sender,
+        rss_limit_mb: float = DEFAULT_RSS_LIMIT_MB,
+        heap_limit_mb: float = DEFAULT_HEAP_LIMIT_MB,
+        check_interval: float = CHECK_INTERVAL
+    ):
+        self.sender = sender
+        self.rss_limit_mb = rss_limit_mb    # 0 = sem limite
+        self.heap_limit_mb = heap_limit_mb  # 0 = sem limite
+        self.check_interval = check_interval
+        self.logger = get_logger()
+
+        self.recycles = 0
+        self.failed_recycles = 0
+        self.recycle_seconds = 0.0
+        self.last_sample: dict = {}
+        self.peak_rss_mb = 0.0
+        self.peak_heap_mb = 0.0
+        self._next_check = time.monotonic() + check_interval
+
+    @classmethod
+    def from_config(cls, sender) -> 'BrowserWatchdog':
+        from controllers.services.config_service import ConfigService
+        limits = ConfigService.create_default_config(get_base_dir()).get("browser_memory_limits", {}) or {}
+        return cls(
+            sender,
+            rss_limit_mb=limits.get("rss_mb", cls.DEFAULT_RSS_LIMIT_MB),
+            heap_limit_mb=limits.get("heap_mb", cls.DEFAULT_HEAP_LIMIT_MB)
+        )
+
+    def due(self) -> bool:
+        return time.monotonic() >= self._next_check
+
+    def sample(self) -> dict:
+        self._next_check = time.monotonic() + self.check_interval
+        usage = self.sender.get_memory_usage()
+        self.last_sample = usage
+
+        if usage.get("rss_mb") is not None:
+            self.peak_rss_mb = max(self.peak_rss_mb, usage["rss_mb"])
+        if usage.get("heap_mb") is not None:
+            self.peak_heap_mb = max(self.peak_heap_mb, usage["heap_mb"])
+        return usage
+
+    def over_limit(self, usage: Optional[dict] = None) -> str:
+        # Devolve o motivo ("" se dentro dos limites)
+        usage = usage if usage is not None else self.last_sample
+        rss, heap = usage.get("rss_mb"), usage.get("heap_mb")
+        if self.rss_limit_mb and rss is not None and rss > self.rss_limit_mb:
+            return f"RSS {rss:.0f}MB > {self.rss_limit_mb}MB"
+        if self.heap_limit_mb and heap is not None and heap > self.heap_limit_mb:
+            return f"heap JS {heap:.0f}MB > {self.heap_limit_mb}MB"
+        return ""
+
+    def check_and_recycle(self) -> bool:
+        # Chamado entre contactos (ponto seguro); devolve True se a página foi reciclada
+        if not self.due():
+            return False
+
+        usage = self.sample()
+        reason = self.over_limit(usage)
+        self.logger.debug(
+            f"Memória do navegador: RSS {usage.get('rss_mb') or 0:.0f}MB, heap {usage.get('heap_mb') or 0:.0f}MB",
+            source=SOURCE
+        )
+        if not reason:
+            return False
+
+        self.logger.warning(f"Limite de memória excedido ({reason}), a reciclar a página...", source=SOURCE)
+        started = time.monotonic()
+        success = self.sender.recycle_page()
+        elapsed = time.monotonic() - started
+        self.recycle_seconds += elapsed
+
+        if success:
+            self.recycles += 1
+            after = self.sample()
+            self.logger.info(
+                f"Página reciclada em {elapsed:.1f}s (RSS {after.get('rss_mb') or 0:.0f}MB, heap {after.get('heap_mb') or 0:.0f}MB)",
+                source=SOURCE
+            )
+        else:
+            self.failed_recycles += 1
+            self.logger.error("Falha ao reciclar a página do WhatsApp", source=SOURCE)
+        return success
+
+    def get_stats(self) -> dict:
+        return {
+            "recycles": self.recycles,
+            "failed_recycles": self.failed_recycles,
+            "recycle_seconds": round(self.recycle_seconds, 1),
+            "peak_rss_mb": round(self.peak_rss_mb),
+            "peak_heap_mb": round(self.peak_heap_mb),
+        }
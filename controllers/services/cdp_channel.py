@@ -0,0 +1,143 @@
+import json
+import threading
+import time
+from typing import Any, Optional
+import requests
+import websocket
+from utils.logger import get_logger
+
+SOURCE = "CdpChannel"
+
+class CdpError(Exception):
+    # request_sent: o pedido chegou a sair (o script pode ter corrido no navegador)
+    def __init__(self, message: str, request_sent: bool = False):
+        super().__init__(message)
+        self.request_sent = request_sent
+
+class CdpScriptError(Exception):
+    pass
+
+class CdpTimeout(Exception):
+    pass
+
+class CdpChannel:
+    CONNECT_TIMEOUT = 5
+
+    def __init__(self, port: int, target_id: Optional[str] = None, url_match: str = "web.whatsapp.com"):
+        self.port = port
+        self.target_id = target_id  # No Chromium, o window handle do Selenium é o id do alvo CDP
+        self.url_match = url_match
+        self.logger = get_logger()
+        self._ws: Optional[websocket.WebSocket] = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None and self._ws.connected
+
+    def _find_target(self) -> Optional[str]:
+        response = requests.get(f"http://127.0.0.1:{self.port}/json/list", timeout=self.CONNECT_TIMEOUT)
+        pages = [t for t in response.json() if t.get("type") == "page" and t.get("webSocketDebuggerUrl")]
+        for target in pages:
+            if self.target_id and target.get("id") == self.target_id:
+                return target["webSocketDebuggerUrl"]
+        for target in pages:
+            if self.url_match in (target.get("url") or ""):
+                return target["webSocketDebuggerUrl"]
+        return None
+
+    def connect(self) -> bool:
+        self.close()
+        try:
+            ws_url = self._find_target()
+            if not ws_url:
+                self.logger.debug("Separador do WhatsApp não encontrado no canal CDP", source=SOURCE)
+                return False
+            # Sem cabeçalho Origin: o Edge recusa origens não autorizadas (--remote-allow-origins)
+            self._ws = websocket.create_connection(ws_url, timeout=self.CONNECT_TIMEOUT, suppress_origin=True)
+            self.logger.debug(f"Canal CDP ligado: {ws_url}", source=SOURCE)
+            return True
+        except Exception as e:
+            self.logger.debug(f"Canal CDP indisponível: {str(e)[:100]}", source=SOURCE)
+            self._ws = None
+            return False
+
+    def close(self):
+        if self._ws is not None:
+            try:
+                self._ws.close()
+            except Exception:
+                pass
+            self._ws = None
+
+    def evaluate(self, expression: str, timeout: float = 30, await_promise: bool = True) -> Any:
+        with self._lock:
+            if not self.connected and not self.connect():
+                raise CdpError("Canal CDP desligado")
+
+            self._next_id += 1
+            message_id = self._next_id
+            request = {
+                "id": message_id,
+                "method": "Runtime.evaluate",
+                "params": {
+                    "expression": expression,
+                    "awaitPromise": await_promise,
+                    "returnByValue": True,
+                },
+            }
+            try:
+                self._ws.send(json.dumps(request))
+            except Exception as e:
+                self.close()
+                raise CdpError(f"Erro ao enviar pedido CDP: {e}")
+
+            response = self._read_response(message_id, timeout)
+
+        if "error" in response:
+            raise CdpError(f"CDP: {response['error'].get('message', response['error'])}", request_sent=True)
+        result = response.get("result", {})
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            text = (details.get("exception") or {}).get("description") or details.get("text", "Erro no script")
+            raise CdpScriptError(text)
+        return (result.get("result") or {}).get("value")
+
+    def _read_response(self, message_id: int, timeout: float) -> dict:
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # A resposta atrasada é ignorada na próxima leitura (id diferente)
+                raise CdpTimeout(f"Sem resposta CDP em {timeout}s")
+            try:
+                self._ws.settimeout(remaining)
+                raw = self._ws.recv()
+            except websocket.WebSocketTimeoutException:
+                continue
+            except Exception as e:
+                self.close()
+                raise CdpError(f"Ligação CDP perdida: {e}", request_sent=True)
+
+            try:
+                message = json.loads(raw)
+            except ValueError:
+                continue
+            # Eventos e respostas a pedidos anteriores (após timeout) não interessam
+            if message.get("id") == message_id:
+                return message
+
+    def run_async_script(self, script: str, *args, timeout: float = 30) -> Any:
+        # Mesmo formato do execute_async_script: o último argumento é a callback
+        expression = (
+            "new Promise(function(resolve) {"
+            f"(function() {{ {script} \n}}).apply(null, {json.dumps(list(args))}.concat([resolve]));"
+            "})"
+        )
+        return self.evaluate(expression, timeout=timeout)
+
+    def run_script(self, script: str, *args, timeout: float = 30) -> Any:
+        # Mesmo formato do execute_script: o valor devolvido pelo 'return'
+        expression = f"(function() {{ {script} \n}}).apply(null, {json.dumps(list(args))})"
+        return self.evaluate(expression, timeout=timeout, await_promise=False)
@@ -0,0 +1,215 @@
+import json
+import os
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Dict
+from models.contact import Contact
+from models.Result import Result
+from utils.logger import get_logger
+
+SOURCE = "CampaignCheckpoint"
+
+class CheckpointStage:
+    PENDING = "pendente"
+    WELCOME_SENDING = "boas_vindas_em_envio"
+    WELCOME_DONE = "boas_vindas_feitas"
+    GENERAL_SENDING = "geral_em_envio"
+    DONE = "concluido"
+    SKIPPED = "ignorado"
+
+class CampaignCheckpoint:
+    HEADER_FILE = "checkpoint.json"
+    JOURNAL_FILE = "journal.jsonl"
+
+    # Estados em que a mensagem geral já foi (ou pode ter sido) enviada
+    FINISHED_STAGES = (CheckpointStage.GENERAL_SENDING, CheckpointStage.DONE, CheckpointStage.SKIPPED)
+    # Estados em que as boas-vindas já foram (ou podem ter sido) enviadas
+    WELCOME_STAGES = (CheckpointStage.WELCOME_SENDING, CheckpointStage.WELCOME_DONE)
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.logger = get_logger()
+        self.header: dict = {}
+        self._stages: Dict[int, str] = {}
+        self._snapshots: Dict[int, dict] = {}
+        self._results: List[Result] = []
+
+    @property
+    def header_path(self) -> Path:
+        return self.directory / self.HEADER_FILE
+
+    @property
+    def journal_path(self) -> Path:
+        return self.directory / self.JOURNAL_FILE
+
+    @property
+    def campaign_id(self) -> str:
+        return self.header.get("id", "")
+
+    @property
+    def method(self) -> str:
+        return self.header.get("method", "whatsapp")
+
+    @property
+    def results(self) -> List[Result]:
+        return list(self._results)
+
+    @staticmethod
+    def exists(directory: Path) -> bool:
+        return (Path(directory) / CampaignCheckpoint.HEADER_FILE).exists()
+
+    @classmethod
+    def load(cls, directory: Path) -> Optional['CampaignCheckpoint']:
+        checkpoint = cls(directory)
+        if not checkpoint.header_path.exists():
+            return None
+
+        try:
+            with open(checkpoint.header_path, 'r', encoding='utf-8') as f:
+                checkpoint.header = json.load(f)
+        except Exception as e:
+            checkpoint.logger.error("Checkpoint da campanha ilegível", error=e, source=SOURCE)
+            return None
+
+        checkpoint._replay_journal()
+        return checkpoint
+
+    def _replay_journal(self):
+        if not self.journal_path.exists():
+            return
+
+        by_message_id: Dict[str, Result] = {}
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Última linha incompleta (crash a meio da escrita)
+                    self.logger.warning("Entrada incompleta no journal ignorada", source=SOURCE)
+                    continue
+
+                # Confirmação de entrega/leitura chegada depois do envio
+                ack = entry.get("ack")
+                if ack:
+                    result = by_message_id.get(ack.get("id", ""))
+                    if result is not None:
+                        result.update_ack(ack.get("value", 0))
+                    continue
+
+                index = entry.get("i")
+                if index is None:
+                    continue
+                self._stages[index] = entry.get("stage", CheckpointStage.PENDING)
+                if entry.get("contact"):
+                    self._snapshots[index] = entry["contact"]
+                if entry.get("result"):
+                    result = Result.from_dict(entry["result"])
+                    self._results.append(result)
+                    if result.message_id:
+                        by_message_id[result.message_id] = result
+
+    def start(
+        self,
+        method: str,
+        contacts: List[Contact],
+        message_template: str,
+        welcome_template: str,
+        delay: int,
+        check_stop_response: bool,
+        daily_cap: Optional[int] = None
+    ):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.header = {
+            "id": uuid.uuid4().hex,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "method": method,
+            "message_template": message_template,
+            "welcome_template": welcome_template,
+            "delay": delay,
+            "check_stop_response": check_stop_response,
+            "daily_cap": daily_cap,
+            "contacts": [c.to_dict() for c in contacts],
+        }
+        self._stages.clear()
+        self._snapshots.clear()
+        self._results.clear()
+
+        # Escrita atómica do cabeçalho; o journal começa vazio
+        tmp_path = self.header_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.header, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.header_path)
+
+        with open(self.journal_path, 'w', encoding='utf-8'):
+            pass
+
+    def stage(self, index: int) -> str:
+        return self._stages.get(index, CheckpointStage.PENDING)
+
+    def record(self, index: int, stage: str, contact: Contact, result: Optional[Result] = None):
+        self._stages[index] = stage
+        entry = {"i": index, "stage": stage, "contact": contact.to_dict()}
+        if result is not None:
+            entry["result"] = result.to_dict()
+            self._results.append(result)
+        self._append([entry])
+
+    def record_acks(self, acks: Dict[str, int]):
+        # O envio já foi gravado com ack 0: as confirmações seguintes ficam em linhas próprias
+        if acks:
+            self._append([{"ack": {"id": message_id, "value": ack}} for message_id, ack in acks.items()])
+
+    def _append(self, entries: List[dict]):
+        # Uma linha por evento, sincronizada com o disco antes de continuar
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def restore_contacts(self, live_contacts: List[Contact]) -> List[Contact]:
+        # Reutiliza os objetos carregados na aplicação para que as alterações fiquem visíveis
+        by_phone = {c.telemovel: c for c in live_contacts}
+        contacts: List[Contact] = []
+
+        for index, data in enumerate(self.header.get("contacts", [])):
+            contact = by_phone.get(Contact.normalize_phone(data.get("telemovel", "")))
+            if contact is None:
+                contact = Contact.from_dict(data)
+
+            # Aplica o estado gravado após o último envio (data do envio, opt-out)
+            snapshot = self._snapshots.get(index)
+            if snapshot:
+                contact.ultimo_envio = snapshot.get("ultimo_envio", contact.ultimo_envio)
+                contact.ativo = snapshot.get("ativo", contact.ativo)
+
+            contacts.append(contact)
+
+        return contacts
+
+    def summary(self) -> dict:
+        total = len(self.header.get("contacts", []))
+        finished = sum(1 for i in range(total) if self.stage(i) in self.FINISHED_STAGES)
+        return {
+            "id": self.campaign_id,
+            "method": self.method,
+            "created_at": self.header.get("created_at", ""),
+            "total": total,
+            "finished": finished,
+            "pending": total - finished,
+            "results": len(self._results),
+        }
+
+    def finish(self):
+        for path in (self.journal_path, self.header_path):
+            try:
+                if path.exists():
+                    path.unlink()
+            except Exception as e:
+                self.logger.warning(f"Erro ao remover checkpoint {path}: {e}", source=SOURCE)
@@ -9,7 +9,15 @@ class ConfigService:
         "delay": 5,
         "message": "Olá {nome}!\n",
         "welcome": "Bem vindo(a) {nome}. \nEnvie \"PARAR\" para não receber mais mensagens.",
-        "sheets_url": ""
+        "sheets_url": "",
+        "daily_cap": {"whatsapp": 0, "sms": 0},
+        "invalid_number_ttl_days": 30,
+        "whatsapp_idle_timeout_min": 30,
+        "whatsapp_keep_browser_on_exit": False,
+        "whatsapp_low_resource": False,
+        "whatsapp_headless": False,
+        "whatsapp_cdp_channel": True,
+        "browser_memory_limits": {"rss_mb": 1500, "heap_mb": 700}
     }
     
     def __init__(self, config_file: Path):
@@ -9,6 +9,7 @@ from dataclasses import dataclass, field
 from enum import Enum
 from models.contact import Contact
 from controllers.services.contact_service import ContactService
+from controllers.services.preview_provider import PreviewProvider
 import pandas as pd
 import requests
 from utils.time import str_datetime, str_timestamp
@@ -141,24 +142,18 @@ class DataHandler:
         # Se não tiver pach ou se não for json
         return self._contact_service.save_json(save_path)
 
-    def get_preview_data(self, message: str, welcome: str = "") -> List[dict]:
-        preview = []
-        
-        for contact in self._contact_service.contacts:
-            if not contact.ativo:
-                status = "Bloqueado: "
-            else:
-                status = "Será enviado"
-            
-            personal_msg = message.replace("{nome}", contact.nome)
-            personal_welcome = welcome.replace("{nome}", contact.nome) if welcome.strip() else ""
-            
-            preview.append({
-                "nome": contact.nome,
-                "telefone": contact.telemovel,
-                "mensagem": personal_msg,
-                "boas_vindas": personal_welcome if not contact.ultimo_envio else "(não aplicável)",
-                "status": status
-            })
-        
-        return preview
\ No newline at end of file
+    def get_preview_provider(self, message: str, welcome: str = "") -> PreviewProvider:
+        return PreviewProvider(self._contact_service.contacts, message, welcome)
+
+    def get_preview_data(
+        self,
+        message: str,
+        welcome: str = "",
+        start: int = 0,
+        count: Optional[int] = None
+    ) -> List[dict]:
+        # Renderiza apenas a janela pedida (por omissão, todos os contactos)
+        provider = self.get_preview_provider(message, welcome)
+        if count is None:
+            count = len(provider)
+        return provider.get_window(start, count)
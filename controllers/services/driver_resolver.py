@@ -0,0 +1,75 @@
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+from utils.logger import get_logger
+
+SOURCE = "EdgeDriverResolver"
+
+class EdgeDriverResolver:
+    def __init__(self, cache_file: Path):
+        self.cache_file = Path(cache_file)
+        self.logger = get_logger()
+
+    def get_browser_version(self) -> Optional[str]:
+        # Lê a versão instalada sem abrir o navegador (registo no Windows, --version nos outros)
+        try:
+            from webdriver_manager.core.os_manager import OperationSystemManager, ChromeType
+            return OperationSystemManager().get_browser_version_from_os(ChromeType.MSEDGE)
+        except Exception as e:
+            self.logger.debug(f"Versão do Edge indisponível: {e}", source=SOURCE)
+            return None
+
+    def _load(self) -> dict:
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _save(self, driver_path: str, browser_version: Optional[str]):
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_file.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "driver_path": driver_path,
+                    "browser_version": browser_version or "",
+                    "resolved_at": datetime.now().isoformat(timespec="seconds"),
+                }, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.cache_file)
+        except Exception as e:
+            self.logger.warning(f"Erro ao guardar cache do driver: {e}", source=SOURCE)
+
+    def resolve(self) -> Optional[str]:
+        cached = self._load()
+        cached_path = cached.get("driver_path", "")
+        cached_valid = bool(cached_path) and os.path.exists(cached_path)
+        browser_version = self.get_browser_version()
+
+        if cached_valid:
+            if browser_version is None:
+                # Sem forma de comparar (ex: offline/sem registo): o último driver é a melhor aposta
+                self.logger.debug(f"Driver em cache (versão do Edge desconhecida): {cached_path}", source=SOURCE)
+                return cached_path
+            if browser_version == cached.get("browser_version"):
+                self.logger.debug(f"Driver em cache para Edge {browser_version}: {cached_path}", source=SOURCE)
+                return cached_path
+            self.logger.info(
+                f"Edge atualizado ({cached.get('browser_version') or '?'} -> {browser_version}), a obter novo driver...",
+                source=SOURCE
+            )
+
+        try:
+            self.logger.debug("A tentar webdriver-manager...", source=SOURCE)
+            from webdriver_manager.microsoft import EdgeChromiumDriverManager
+            driver_path = EdgeChromiumDriverManager().install()
+            self.logger.debug(f"Driver obtido: {driver_path}", source=SOURCE)
+            self._save(driver_path, browser_version)
+            return driver_path
+        except Exception as e:
+            self.logger.warning(f"WebDriver Manager falhou: {e}", source=SOURCE)
+
+        # Falhou a resolução (ex: sem rede): um driver antigo ainda pode servir
+        return cached_path if cached_valid else None
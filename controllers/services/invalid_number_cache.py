@@ -0,0 +1,131 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional
+from controllers.services.preflight_service import phone_key
+from utils.logger import get_logger
+from utils.environment import get_base_dir
+
+SOURCE = "InvalidNumberCache"
+
+class InvalidNumberCache:
+    DEFAULT_TTL_DAYS = 30
+
+    def __init__(self, path: Optional[Path] = None, ttl_days: int = DEFAULT_TTL_DAYS):
+        self.path = Path(path) if path else None
+        self.ttl = timedelta(days=max(0, int(ttl_days)))  # 0 = nunca expira
+        self.logger = get_logger()
+        self._lock = threading.Lock()
+        self._entries: Dict[str, datetime] = {}
+        self._load()
+
+    @classmethod
+    def load_default(cls) -> 'InvalidNumberCache':
+        from controllers.services.config_service import ConfigService
+        ttl_days = ConfigService.create_default_config(get_base_dir()).get(
+            "invalid_number_ttl_days", cls.DEFAULT_TTL_DAYS
+        )
+        return cls(get_base_dir() / "data" / "invalid_numbers.json", ttl_days=ttl_days)
+
+    def _is_expired(self, added_at: datetime, now: Optional[datetime] = None) -> bool:
+        if not self.ttl:
+            return False
+        return (now or datetime.now()) - added_at > self.ttl
+
+    def _load(self):
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            now = datetime.now()
+            for digits, added_at in data.items():
+                try:
+                    timestamp = datetime.fromisoformat(added_at)
+                except (TypeError, ValueError):
+                    continue
+                if not self._is_expired(timestamp, now):
+                    self._entries[digits] = timestamp
+            self.logger.debug(f"{len(self._entries)} número(s) inválido(s) em cache", source=SOURCE)
+        except Exception as e:
+            self.logger.warning(f"Cache de números inválidos ilegível: {e}", source=SOURCE)
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            data = {d: t.isoformat(timespec="seconds") for d, t in self._entries.items()}
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            self.logger.warning(f"Erro ao guardar cache de números inválidos: {e}", source=SOURCE)
+
+    def add(self, phone: str):
+        digits = phone_key(phone)
+        if not digits:
+            return
+        with self._lock:
+            self._entries[digits] = datetime.now()
+            self._save()
+
+    def add_many(self, phones: Iterable[str]):
+        # Uma única escrita para o lote (a validação em lote marca muitos de uma vez)
+        keys = [d for d in (phone_key(p) for p in phones) if d]
+        if not keys:
+            return
+        now = datetime.now()
+        with self._lock:
+            for digits in keys:
+                self._entries[digits] = now
+            self._save()
+
+    def discard(self, phone: str):
+        with self._lock:
+            if self._entries.pop(phone_key(phone), None) is not None:
+                self._save()
+
+    def is_invalid(self, phone: str) -> bool:
+        return self.get_added_at(phone) is not None
+
+    def get_added_at(self, phone: str) -> Optional[datetime]:
+        with self._lock:
+            added_at = self._entries.get(phone_key(phone))
+        if added_at is None or self._is_expired(added_at):
+            return None
+        return added_at
+
+    def entries(self) -> Dict[str, datetime]:
+        with self._lock:
+            snapshot = dict(self._entries)
+        now = datetime.now()
+        return {d: t for d, t in snapshot.items() if not self._is_expired(t, now)}
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            now = datetime.now()
+            expired = [d for d, t in self._entries.items() if self._is_expired(t, now)]
+            for digits in expired:
+                del self._entries[digits]
+            if expired:
+                self._save()
+        return len(expired)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._save()
+
+    # Interface de conjunto: substitui o antigo set em memória do WhatsAppSender
+    def __contains__(self, phone: object) -> bool:
+        return isinstance(phone, str) and self.is_invalid(phone)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.entries())
+
+    def __len__(self) -> int:
+        return len(self.entries())
@@ -0,0 +1,213 @@
+import json
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, time as dtime
+from pathlib import Path
+from contextlib import contextmanager
+from typing import List, Optional, Iterator
+from utils.logger import get_logger
+
+SOURCE = "JobQueue"
+
+class JobStatus:
+    PENDING = "pendente"
+    RUNNING = "em_execucao"
+    PAUSED = "pausado"      # Fora da janela horária a meio da campanha (retoma pelo checkpoint)
+    DONE = "concluido"
+    FAILED = "falhou"
+    CANCELLED = "cancelado"
+
+@dataclass
+class CampaignJob:
+    method: str
+    contact_phones: List[str]
+    message_template: str
+    welcome_template: str = ""
+    delay: int = 3
+    check_stop_response: bool = True
+    daily_cap: Optional[int] = None
+    window_start: str = ""   # "HH:MM" (vazio = sem restrição)
+    window_end: str = ""     # "HH:MM"
+    not_before: str = ""     # ISO datetime (vazio = imediatamente)
+    status: str = JobStatus.PENDING
+    id: Optional[int] = None
+    created_at: str = field(default_factory=lambda: datetime.now().isoformat(timespec="seconds"))
+    started_at: str = ""
+    finished_at: str = ""
+    error: str = ""
+
+    @staticmethod
+    def _parse_time(value: str) -> Optional[dtime]:
+        try:
+            hours, minutes = value.strip().split(":")
+            return dtime(int(hours), int(minutes))
+        except Exception:
+            return None
+
+    def in_window(self, now: Optional[datetime] = None) -> bool:
+        now = now or datetime.now()
+
+        if self.not_before:
+            try:
+                if now < datetime.fromisoformat(self.not_before):
+                    return False
+            except ValueError:
+                pass
+
+        start = self._parse_time(self.window_start) if self.window_start else None
+        end = self._parse_time(self.window_end) if self.window_end else None
+        if start is None or end is None:
+            return True
+
+        current = now.time()
+        if start <= end:
+            return start <= current < end
+        # Janela que atravessa a meia-noite (ex: 22:00-06:00)
+        return current >= start or current < end
+
+class JobQueue:
+    _COLUMNS = (
+        "method", "contact_phones", "message_template", "welcome_template", "delay",
+        "check_stop_response", "daily_cap", "window_start", "window_end", "not_before",
+        "status", "created_at", "started_at", "finished_at", "error"
+    )
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.logger = get_logger()
+        self._lock = threading.Lock()
+        self._create_schema()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Uma ligação por operação: a fila é usada pela UI e pela thread do scheduler
+        with self._lock:
+            conn = sqlite3.connect(str(self.db_path), timeout=10)
+            conn.row_factory = sqlite3.Row
+            try:
+                with conn:  # commit/rollback automático
+                    yield conn
+            finally:
+                conn.close()
+
+    def _create_schema(self):
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    method TEXT NOT NULL,
+                    contact_phones TEXT NOT NULL,
+                    message_template TEXT NOT NULL,
+                    welcome_template TEXT NOT NULL DEFAULT '',
+                    delay INTEGER NOT NULL DEFAULT 3,
+                    check_stop_response INTEGER NOT NULL DEFAULT 1,
+                    daily_cap INTEGER,
+                    window_start TEXT NOT NULL DEFAULT '',
+                    window_end TEXT NOT NULL DEFAULT '',
+                    not_before TEXT NOT NULL DEFAULT '',
+                    status TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    started_at TEXT NOT NULL DEFAULT '',
+                    finished_at TEXT NOT NULL DEFAULT '',
+                    error TEXT NOT NULL DEFAULT ''
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, id)")
+
+    def _row_to_job(self, row: sqlite3.Row) -> CampaignJob:
+        return CampaignJob(
+            id=row["id"],
+            method=row["method"],
+            contact_phones=json.loads(row["contact_phones"]),
+            message_template=row["message_template"],
+            welcome_template=row["welcome_template"],
+            delay=row["delay"],
+            check_stop_response=bool(row["check_stop_response"]),
+            daily_cap=row["daily_cap"],
+            window_start=row["window_start"],
+            window_end=row["window_end"],
+            not_before=row["not_before"],
+            status=row["status"],
+            created_at=row["created_at"],
+            started_at=row["started_at"],
+            finished_at=row["finished_at"],
+            error=row["error"],
+        )
+
+    def enqueue(self, job: CampaignJob) -> int:
+        values = (
+            job.method, json.dumps(job.contact_phones, ensure_ascii=False), job.message_template,
+            job.welcome_template, job.delay, int(job.check_stop_response), job.daily_cap,
+            job.window_start, job.window_end, job.not_before, JobStatus.PENDING,
+            job.created_at, "", "", ""
+        )
+        placeholders = ", ".join("?" for _ in self._COLUMNS)
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"INSERT INTO jobs ({', '.join(self._COLUMNS)}) VALUES ({placeholders})",
+                values
+            )
+            job.id = cursor.lastrowid
+            job.status = JobStatus.PENDING
+
+        self.logger.info(f"Campanha #{job.id} agendada ({len(job.contact_phones)} contactos)", source=SOURCE)
+        return job.id
+
+    def get(self, job_id: int) -> Optional[CampaignJob]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list_jobs(self, include_finished: bool = False) -> List[CampaignJob]:
+        query = "SELECT * FROM jobs"
+        if not include_finished:
+            query += f" WHERE status IN ('{JobStatus.PENDING}', '{JobStatus.RUNNING}', '{JobStatus.PAUSED}')"
+        query += " ORDER BY id"
+        with self._connect() as conn:
+            rows = conn.execute(query).fetchall()
+        return [self._row_to_job(r) for r in rows]
+
+    def head(self) -> Optional[CampaignJob]:
+        # As campanhas correm por ordem: só a mais antiga por concluir é candidata
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status IN (?, ?, ?) ORDER BY id LIMIT 1",
+                (JobStatus.RUNNING, JobStatus.PAUSED, JobStatus.PENDING)
+            ).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def _update(self, job_id: int, **fields):
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def mark_running(self, job_id: int):
+        self._update(job_id, status=JobStatus.RUNNING, started_at=datetime.now().isoformat(timespec="seconds"))
+
+    def mark_paused(self, job_id: int):
+        self._update(job_id, status=JobStatus.PAUSED)
+
+    def defer(self, job_id: int, not_before: str):
+        self._update(job_id, status=JobStatus.PAUSED, not_before=not_before)
+
+    def requeue(self, job_id: int, not_before: str = ""):
+        # Sem checkpoint (terminou antes do primeiro envio): volta a correr como campanha nova
+        self._update(job_id, status=JobStatus.PENDING, not_before=not_before)
+
+    def mark_done(self, job_id: int):
+        self._update(job_id, status=JobStatus.DONE, finished_at=datetime.now().isoformat(timespec="seconds"))
+
+    def mark_failed(self, job_id: int, error: str):
+        self._update(
+            job_id, status=JobStatus.FAILED, error=error[:500],
+            finished_at=datetime.now().isoformat(timespec="seconds")
+        )
+
+    def cancel(self, job_id: int) -> bool:
+        job = self.get(job_id)
+        if job is None or job.status not in (JobStatus.PENDING, JobStatus.PAUSED):
+            return False
+        self._update(job_id, status=JobStatus.CANCELLED, finished_at=datetime.now().isoformat(timespec="seconds"))
+        return True
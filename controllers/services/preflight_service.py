@@ -0,0 +1,104 @@
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Tuple, Set, Iterable, Optional
+import numpy as np
+import pandas as pd
+from models.contact import Contact
+from utils.logger import get_logger
+
+SOURCE = "Preflight"
+
+class ExclusionReason:
+    INACTIVE = "Contacto inativo"
+    NOT_SELECTED = "Contacto não selecionado"
+    INVALID_PHONE = "Número inválido"
+    KNOWN_INVALID = "Número inválido (cache)"
+    OPTED_OUT = "Pediu para parar"
+    DUPLICATE = "Número duplicado"
+    NO_WHATSAPP = "Número sem WhatsApp"
+
+@dataclass
+class SendPlan:
+    to_send: List[Contact] = field(default_factory=list)
+    excluded: List[Tuple[Contact, str]] = field(default_factory=list)
+
+    @property
+    def opted_out(self) -> List[Contact]:
+        return [c for c, reason in self.excluded if reason == ExclusionReason.OPTED_OUT]
+
+    def exclude(self, contacts: Iterable[Contact], reason: str):
+        removed = {id(c) for c in contacts}
+        if not removed:
+            return
+        self.excluded.extend((c, reason) for c in self.to_send if id(c) in removed)
+        self.to_send = [c for c in self.to_send if id(c) not in removed]
+
+    def reason_counts(self) -> dict:
+        return dict(Counter(reason for _, reason in self.excluded))
+
+    def summary(self) -> str:
+        lines = [f"{len(self.to_send)} contacto(s) a enviar, {len(self.excluded)} excluído(s)"]
+        for reason, count in sorted(self.reason_counts().items(), key=lambda x: -x[1]):
+            lines.append(f"  - {reason}: {count}")
+        return "\n".join(lines)
+
+def phone_key(phone: str) -> str:
+    # Mesmo formato do cache do WhatsAppSender: só dígitos, com indicativo
+    digits = re.sub(r'\D', '', str(phone))
+    if len(digits) == 9:
+        digits = f"351{digits}"
+    return digits
+
+class PreflightService:
+    @staticmethod
+    def build_plan(
+        contacts: List[Contact],
+        known_invalid: Optional[Iterable[str]] = None,
+        opted_out: Optional[Iterable[str]] = None
+    ) -> SendPlan:
+        plan = SendPlan()
+        if not contacts:
+            return plan
+
+        df = pd.DataFrame({
+            "ativo": [bool(c.ativo) for c in contacts],
+            "selecionado": [bool(c.selecionado) for c in contacts],
+            "is_valid": [bool(getattr(c, "is_valid", True)) for c in contacts],
+            "phone": [phone_key(c.telemovel) for c in contacts],
+        })
+
+        known_invalid_set: Set[str] = {phone_key(p) for p in (known_invalid or [])}
+        opted_out_set: Set[str] = {phone_key(p) for p in (opted_out or [])}
+
+        inactive = ~df["ativo"]
+        # Mesmas regras de Contact.pode_receber_mensagem, aplicadas à lista inteira
+        not_selected = ~df["selecionado"]
+        invalid_phone = ~df["is_valid"] | (df["phone"].str.len() < 9)
+        cached_invalid = df["phone"].isin(known_invalid_set)
+        stopped = df["phone"].isin(opted_out_set)
+
+        # Duplicados só contam entre os que passariam nas outras verificações
+        excluded_so_far = inactive | not_selected | invalid_phone | cached_invalid | stopped
+        duplicate = df["phone"].where(~excluded_so_far).duplicated(keep="first") & ~excluded_so_far
+
+        # O opt-out tem prioridade: o contacto tem de ser desativado mesmo se também for inválido
+        conditions = [stopped, inactive, not_selected, invalid_phone, cached_invalid, duplicate]
+        reasons = [
+            ExclusionReason.OPTED_OUT,
+            ExclusionReason.INACTIVE,
+            ExclusionReason.NOT_SELECTED,
+            ExclusionReason.INVALID_PHONE,
+            ExclusionReason.KNOWN_INVALID,
+            ExclusionReason.DUPLICATE,
+        ]
+        reason_col = np.select(conditions, reasons, default="")
+
+        for contact, reason in zip(contacts, reason_col):
+            if reason:
+                plan.excluded.append((contact, str(reason)))
+            else:
+                plan.to_send.append(contact)
+
+        get_logger().debug(f"Preflight: {len(plan.to_send)} a enviar, {len(plan.excluded)} excluídos", source=SOURCE)
+        return plan
@@ -0,0 +1,86 @@
+import hashlib
+from collections import OrderedDict
+from typing import List, Tuple
+from models.contact import Contact
+from controllers.services.message_service import MessageService
+
+class PreviewProvider:
+    DEFAULT_PAGE_SIZE = 50
+    DEFAULT_CACHE_SIZE = 2000
+
+    def __init__(
+        self,
+        contacts: List[Contact],
+        message: str,
+        welcome: str = "",
+        cache_size: int = DEFAULT_CACHE_SIZE
+    ):
+        # Guarda só a referência à lista, nada é renderizado aqui
+        self.contacts = contacts
+        self.message = message or ""
+        self.welcome = welcome or ""
+        self._cache_size = max(1, cache_size)
+        self._cache: "OrderedDict[tuple, Tuple[str, str]]" = OrderedDict()
+        self._message_hash = self._template_hash(self.message)
+        self._welcome_hash = self._template_hash(self.welcome)
+
+    @staticmethod
+    def _template_hash(template: str) -> str:
+        return hashlib.sha1(template.encode("utf-8")).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self.contacts)
+
+    def page_count(self, page_size: int = DEFAULT_PAGE_SIZE) -> int:
+        if page_size <= 0:
+            return 0
+        return max(1, (len(self.contacts) + page_size - 1) // page_size)
+
+    def set_templates(self, message: str, welcome: str = ""):
+        # A cache é indexada pelo hash do template, por isso não precisa de ser limpa
+        self.message = message or ""
+        self.welcome = welcome or ""
+        self._message_hash = self._template_hash(self.message)
+        self._welcome_hash = self._template_hash(self.welcome)
+
+    def render(self, contact: Contact) -> Tuple[str, str]:
+        key = (self._message_hash, self._welcome_hash, contact.telemovel, contact.nome)
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+
+        general = MessageService.personalize_message(self.message, contact) if self.message else ""
+        welcome = MessageService.personalize_message(self.welcome, contact) if self.welcome.strip() else ""
+
+        self._cache[key] = (general, welcome)
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)  # Remove o menos usado recentemente
+
+        return general, welcome
+
+    def get_item(self, contact: Contact) -> dict:
+        general, welcome = self.render(contact)
+        return {
+            "nome": contact.nome,
+            "telefone": contact.telemovel,
+            "mensagem": general,
+            "boas_vindas": welcome if not contact.ultimo_envio else "(não aplicável)",
+            "status": "Será enviado" if contact.ativo else "Bloqueado: "
+        }
+
+    def get_window(self, start: int, count: int) -> List[dict]:
+        start = max(0, start)
+        end = min(len(self.contacts), start + max(0, count))
+        return [self.get_item(self.contacts[i]) for i in range(start, end)]
+
+    def get_page(self, page: int, page_size: int = DEFAULT_PAGE_SIZE) -> List[dict]:
+        return self.get_window(page * page_size, page_size)
+
+    def get_page_contacts(self, page: int, page_size: int = DEFAULT_PAGE_SIZE) -> List[Contact]:
+        start = max(0, page * page_size)
+        return self.contacts[start:start + page_size]
+
+    def cache_info(self) -> dict:
+        return {"size": len(self._cache), "max_size": self._cache_size}
@@ -0,0 +1,99 @@
+import json
+import os
+from pathlib import Path
+from typing import List, Dict, Optional
+import psutil
+from utils.logger import get_logger
+
+SOURCE = "ProcessRegistry"
+
+class ProcessRegistry:
+    REGISTRY_FILE = "app_processes.json"
+    # Tolerância na comparação do create_time (o valor lido varia ligeiramente entre chamadas)
+    CREATE_TIME_TOLERANCE = 1.0
+
+    def __init__(self, directory: Path):
+        self.path = Path(directory) / self.REGISTRY_FILE
+        self.logger = get_logger()
+
+    def _load(self) -> List[Dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, list) else []
+        except Exception:
+            return []
+
+    def _save(self, entries: List[Dict]):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            self.logger.warning(f"Erro ao guardar registo de processos: {e}", source=SOURCE)
+
+    def record(self, role: str, pid: int):
+        # Substitui a entrada anterior do mesmo papel ("driver" ou "browser")
+        try:
+            proc = psutil.Process(pid)
+            entry = {"role": role, "pid": pid, "create_time": proc.create_time(), "name": proc.name()}
+        except psutil.Error as e:
+            self.logger.debug(f"Processo {pid} não registado: {e}", source=SOURCE)
+            return
+        entries = [e for e in self._load() if e.get("role") != role]
+        entries.append(entry)
+        self._save(entries)
+
+    def forget(self, role: str):
+        entries = self._load()
+        remaining = [e for e in entries if e.get("role") != role]
+        if len(remaining) != len(entries):
+            self._save(remaining)
+
+    def clear(self):
+        try:
+            if self.path.exists():
+                self.path.unlink()
+        except Exception as e:
+            self.logger.warning(f"Erro ao limpar registo de processos: {e}", source=SOURCE)
+
+    def live_processes(self, role: Optional[str] = None) -> List[psutil.Process]:
+        # Só devolve processos cuja identidade (PID + create_time) coincide com o registo
+        processes = []
+        for entry in self._load():
+            if role is not None and entry.get("role") != role:
+                continue
+            try:
+                proc = psutil.Process(int(entry["pid"]))
+                if abs(proc.create_time() - float(entry["create_time"])) > self.CREATE_TIME_TOLERANCE:
+                    continue  # PID reutilizado por outro processo
+                processes.append(proc)
+            except (psutil.Error, KeyError, ValueError, TypeError):
+                continue
+        return processes
+
+    def terminate_all(self, timeout: float = 5.0) -> int:
+        targets: Dict[int, psutil.Process] = {}
+        for proc in self.live_processes():
+            targets[proc.pid] = proc
+            try:
+                for child in proc.children(recursive=True):
+                    targets[child.pid] = child
+            except psutil.Error:
+                pass
+
+        for proc in targets.values():
+            try:
+                proc.kill()
+            except psutil.Error:
+                pass
+
+        # Espera pela saída efetiva em vez de um tempo fixo
+        _, alive = psutil.wait_procs(list(targets.values()), timeout=timeout)
+        if alive:
+            self.logger.warning(f"{len(alive)} processo(s) não terminaram a tempo", source=SOURCE)
+
+        self.clear()
+        return len(targets) - len(alive)
@@ -5,7 +5,7 @@ from datetime import datetime
 from typing import List
 from dataclasses import dataclass
 from utils.logger import get_logger
-from models.Result import Result, statusType, messageType
+from models.Result import Result, statusType, messageType, ackType
 
 class ReportGenerator:
     
@@ -20,7 +20,12 @@ class ReportGenerator:
             "general_reports": 0,
             "welcome_success": 0,
             "general_success": 0,
-            "success_%": 0
+            "success_%": 0,
+            "tracked": 0,     # Envios com id do WhatsApp (confirmações possíveis)
+            "delivered": 0,
+            "read": 0,
+            "delivered_%": 0,
+            "read_%": 0
         }
 
         status_map = {
@@ -46,9 +51,20 @@ class ReportGenerator:
                 if report.status == statusType.SUCCESS:
                     stats["general_success"] += 1
 
+            # Confirmações de entrega/leitura (só WhatsApp)
+            if report.status == statusType.SUCCESS and report.message_id:
+                stats["tracked"] += 1
+                if report.delivered:
+                    stats["delivered"] += 1
+                if report.read:
+                    stats["read"] += 1
+
         # Calcula percentagem de sucesso
         if stats["total"] > 0:
             stats["success_%"] = int(round((stats["successful"] / stats["total"] * 100), 0))
+        if stats["tracked"] > 0:
+            stats["delivered_%"] = int(round((stats["delivered"] / stats["tracked"] * 100), 0))
+            stats["read_%"] = int(round((stats["read"] / stats["tracked"] * 100), 0))
 
         return stats
 
@@ -65,6 +81,13 @@ class ReportGenerator:
             messageType.GENERAL: ("Geral", "type-general")
         }
 
+        ack_config = {
+            ackType.SENT.value: "Enviada",
+            ackType.DELIVERED.value: "Entregue",
+            ackType.READ.value: "Lida",
+            ackType.PLAYED.value: "Lida"
+        }
+
         rows = []
         for report in reports:
             # Obtém configuração de status
@@ -79,11 +102,18 @@ class ReportGenerator:
                 ("Geral", "type-general")
             )
 
+            # Estado de entrega: só há confirmações para envios com id do WhatsApp
+            if report.status == statusType.SUCCESS and report.message_id:
+                ack_text = ack_config.get(report.ack, "Sem confirmação")
+            else:
+                ack_text = "-"
+
             rows.append(f"""            <tr>
                 <td>{report.contact_name}</td>
                 <td>{report.contact_phone}</td>
                 <td class=\"{type_class}\">{type_text}</td>
                 <td class=\"{status_class}\">{status_text}</td>
+                <td>{ack_text}</td>
                 <td>{report.message}</td>
                 <td>{report.timestamp}</td>
             </tr>""")
@@ -96,6 +126,7 @@ class ReportGenerator:
             <th>Telefone</th>
             <th>Tipo</th>
             <th>Status</th>
+            <th>Entrega</th>
             <th>Observação</th>
             <th>Data/Hora</th>
             </tr>
@@ -111,6 +142,12 @@ class ReportGenerator:
             # Obtém dados
             stats = ReportGenerator.generate_statistics(reports)
             table = ReportGenerator.generate_table_html(reports)
+
+            delivery_summary = ""
+            if stats["tracked"] > 0:
+                delivery_summary = f"""
+        <p><strong>Entregues:</strong> {stats["delivered"]}/{stats["tracked"]} ({stats["delivered_%"]}%)</p>
+        <p><strong>Lidas:</strong> {stats["read"]}/{stats["tracked"]} ({stats["read_%"]}%)</p>"""
             
             html_content = f"""<!DOCTYPE html>
 <html>
@@ -166,11 +203,11 @@ class ReportGenerator:
     <div class="summary">
         <h2>Resumo</h2>
         <p><strong>Total de envios:</strong> {stats["total"]}</p>
-        <p class="success"><strong>Sucesso:</strong> {stats["successful"]}/{stats["total"]} ({stats["success_pct"]:.1f}%)</p>
+        <p class="success"><strong>Sucesso:</strong> {stats["successful"]}/{stats["total"]} ({stats["success_%"]}%)</p>
         <p class="invalid"><strong>Números Inválidos:</strong> {stats["invalid"]}/{stats["total"]}</p>
         <p class="error"><strong>Erros:</strong> {stats["errors"]}/{stats["total"]}</p>
         <p><strong>Boas-vindas:</strong> {stats["welcome_reports"]} ({stats["welcome_success"]} com sucesso)</p>
-        <p><strong>Mensagens gerais:</strong> {stats["general_reports"]} ({stats["general_success"]} com sucesso)</p>
+        <p><strong>Mensagens gerais:</strong> {stats["general_reports"]} ({stats["general_success"]} com sucesso)</p>{delivery_summary}
     </div>
     
     <h2>Detalhes</h2>
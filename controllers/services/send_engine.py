@@ -0,0 +1,97 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from typing import Optional, Callable, Any, Coroutine
+from utils.logger import get_logger
+
+SOURCE = "SendEngine"
+
+class SenderStalledError(Exception):
+    pass
+
+class AsyncSendEngine:
+    # Segundos que uma chamada espera que a anterior (que excedeu o prazo) liberte o sender
+    STALL_GRACE = 30
+
+    def __init__(self):
+        self.logger = get_logger()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._main_task: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._inflight: Optional[Future] = None  # Última chamada entregue ao worker
+        self._cancel_requested = False
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel_requested
+
+    @property
+    def busy(self) -> bool:
+        # A chamada pode continuar no worker depois de um timeout ou de o envio ser cancelado
+        return self._inflight is not None and not self._inflight.done()
+
+    def run(self, coro: Coroutine) -> bool:
+        # Bloqueia a thread atual até o envio terminar; devolve False se foi cancelado
+        # Um único worker garante que o sender (Selenium/ADB) nunca é usado em paralelo
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="SendEngine")
+        try:
+            return asyncio.run(self._main(coro))
+        finally:
+            # Não espera por chamadas presas no sender: quem usa o motor chama wait_idle()
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._loop = None
+            self._main_task = None
+
+    async def _main(self, coro: Coroutine) -> bool:
+        self._loop = asyncio.get_running_loop()
+        self._main_task = asyncio.current_task()
+
+        if self._cancel_requested:
+            coro.close()
+            return False
+
+        try:
+            await coro
+            return True
+        except asyncio.CancelledError:
+            self.logger.debug("Envio cancelado", source=SOURCE)
+            return False
+
+    def cancel(self):
+        # Pode ser chamado a partir de qualquer thread (ex: botão "Parar" da UI)
+        self._cancel_requested = True
+        loop, task = self._loop, self._main_task
+        if loop is not None and task is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                pass  # O loop já terminou
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        # Bloqueia até o worker terminar a última chamada; False se o prazo acabou antes
+        inflight = self._inflight
+        if inflight is None:
+            return True
+        done, _ = wait([inflight], timeout=timeout)
+        return bool(done)
+
+    async def call(self, fn: Callable[..., Any], *args, timeout: float, **kwargs) -> Any:
+        # Corre uma chamada bloqueante no executor com prazo; levanta asyncio.TimeoutError
+        if self._loop is None or self._executor is None:
+            raise RuntimeError("Motor de envio não está a correr")
+
+        # Nunca fica em fila atrás de uma chamada presa: o prazo conta só a partir do início
+        inflight = self._inflight
+        if inflight is not None and not inflight.done():
+            await asyncio.wait({asyncio.wrap_future(inflight)}, timeout=self.STALL_GRACE)
+            if not inflight.done():
+                raise SenderStalledError("O sender continua ocupado com uma chamada que excedeu o prazo")
+
+        future = self._executor.submit(functools.partial(fn, *args, **kwargs))
+        self._inflight = future
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+
+    async def sleep(self, seconds: float):
+        if seconds > 0:
+            await asyncio.sleep(seconds)
@@ -0,0 +1,156 @@
+import json
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, date, timedelta
+from pathlib import Path
+from typing import Optional, Dict
+from utils.logger import get_logger
+
+SOURCE = "SendPacer"
+
+@dataclass
+class ChannelProfile:
+    name: str
+    min_interval: float  # Intervalo mínimo entre envios (segundos)
+    daily_cap: int       # Máximo de envios por dia (0 = sem limite)
+
+CHANNEL_PROFILES: Dict[str, ChannelProfile] = {
+    # Sem limite diário por omissão: só o utilizador define um
+    "whatsapp": ChannelProfile(name="whatsapp", min_interval=1.0, daily_cap=0),
+    "sms": ChannelProfile(name="sms", min_interval=2.0, daily_cap=0),
+}
+
+def get_channel_profile(channel: str) -> ChannelProfile:
+    profile = CHANNEL_PROFILES.get(channel)
+    if profile is None:
+        return ChannelProfile(name=channel, min_interval=1.0, daily_cap=0)
+    return ChannelProfile(profile.name, profile.min_interval, profile.daily_cap)
+
+class SendPacer:
+    def __init__(
+        self,
+        channel: str,
+        interval: float,
+        daily_cap: Optional[int] = None,
+        state_file: Optional[Path] = None
+    ):
+        self.profile = get_channel_profile(channel)
+        if daily_cap is not None:
+            self.profile.daily_cap = max(0, int(daily_cap))
+
+        self.interval = max(float(interval), self.profile.min_interval)
+        self.logger = get_logger()
+        self._state_file = state_file
+
+        self._next_slot: Optional[float] = None
+        self._started_at: Optional[float] = None
+        self._session_sends = 0
+
+        self._day = date.today().isoformat()
+        self._day_counts: Dict[str, int] = self._load_day_counts()
+        self._day_count = self._day_counts.get(self.channel, 0)
+
+    @property
+    def channel(self) -> str:
+        return self.profile.name
+
+    @property
+    def sent_today(self) -> int:
+        self._roll_day()
+        return self._day_count
+
+    @property
+    def session_sends(self) -> int:
+        return self._session_sends
+
+    def _roll_day(self):
+        today = date.today().isoformat()
+        if today != self._day:
+            self._day = today
+            self._day_counts = {}
+            self._day_count = 0
+
+    def _load_day_counts(self) -> Dict[str, int]:
+        # Lido uma vez: os contadores dos outros canais são preservados ao guardar
+        if not self._state_file or not self._state_file.exists():
+            return {}
+        try:
+            with open(self._state_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return {channel: int(count) for channel, count in data.get(self._day, {}).items()}
+        except Exception as e:
+            self.logger.warning(f"Contadores diários ilegíveis: {e}", source=SOURCE)
+            return {}
+
+    def _save_day_count(self):
+        if not self._state_file:
+            return
+        try:
+            self._day_counts[self.channel] = self._day_count
+            self._state_file.parent.mkdir(parents=True, exist_ok=True)
+            # Escrita atómica: um ficheiro temporário substitui o anterior; mantém apenas o dia atual
+            tmp_path = self._state_file.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({self._day: self._day_counts}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self._state_file)
+        except Exception as e:
+            self.logger.warning(f"Erro ao guardar contadores diários: {e}", source=SOURCE)
+
+    def cap_reached(self) -> bool:
+        if self.profile.daily_cap <= 0:
+            return False
+        return self.sent_today >= self.profile.daily_cap
+
+    def remaining_today(self) -> Optional[int]:
+        if self.profile.daily_cap <= 0:
+            return None
+        return max(0, self.profile.daily_cap - self.sent_today)
+
+    def time_until_next_slot(self) -> float:
+        # Segundos até ao próximo envio permitido (0 se já pode enviar)
+        if self._next_slot is None:
+            return 0.0
+        return max(0.0, self._next_slot - time.monotonic())
+
+    def mark_send(self):
+        # Regista o início de um envio e agenda o próximo slot a partir deste instante
+        now = time.monotonic()
+        if self._started_at is None:
+            self._started_at = now
+
+        # Se o slot anterior já passou, agenda a partir de agora (não acumula atraso)
+        base = now if self._next_slot is None else max(now, self._next_slot)
+        self._next_slot = base + self.interval
+
+        self._session_sends += 1
+        self._roll_day()
+        self._day_count += 1
+        self._save_day_count()
+
+    def achieved_rate(self) -> float:
+        # Mensagens por minuto desde o primeiro envio
+        if self._started_at is None or self._session_sends < 2:
+            return 0.0
+        elapsed = time.monotonic() - self._started_at
+        if elapsed <= 0:
+            return 0.0
+        return (self._session_sends - 1) / elapsed * 60
+
+    def estimate_completion(self, remaining_sends: int) -> datetime:
+        seconds_per_send = self.interval
+        rate = self.achieved_rate()
+        if rate > 0:
+            seconds_per_send = max(seconds_per_send, 60 / rate)
+        return datetime.now() + timedelta(seconds=max(0, remaining_sends) * seconds_per_send)
+
+    def get_stats(self, remaining_sends: int = 0) -> dict:
+        return {
+            "channel": self.channel,
+            "interval": self.interval,
+            "rate_per_min": round(self.achieved_rate(), 1),
+            "target_rate_per_min": round(60 / self.interval, 1) if self.interval > 0 else 0.0,
+            "sent_today": self.sent_today,
+            "daily_cap": self.profile.daily_cap,
+            "eta": self.estimate_completion(remaining_sends),
+        }
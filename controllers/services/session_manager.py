@@ -0,0 +1,111 @@
+import threading
+from typing import Optional, Tuple
+from utils.logger import get_logger
+
+SOURCE = "SessionManager"
+
+class WhatsAppSessionManager:
+    DEFAULT_IDLE_TIMEOUT = 30 * 60  # Segundos sem campanhas até fechar o navegador
+
+    def __init__(self, idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        self.logger = get_logger()
+        self.idle_timeout = idle_timeout
+        self._sender = None
+        self._busy = False
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.RLock()
+
+    @property
+    def sender(self):
+        return self._sender
+
+    @property
+    def is_busy(self) -> bool:
+        return self._busy
+
+    def set_idle_timeout(self, seconds: float):
+        # 0 = nunca fecha por inatividade
+        with self._lock:
+            self.idle_timeout = max(0.0, float(seconds))
+            if not self._busy and self._sender is not None:
+                self._schedule_idle_close()
+
+    def check_health(self) -> Tuple[bool, str]:
+        with self._lock:
+            sender = self._sender
+        if sender is None or getattr(sender, "driver", None) is None:
+            return False, "Navegador fechado"
+
+        try:
+            current_url = sender.driver.current_url or ""
+        except Exception as e:
+            # Navegador fechado à mão ou a sessão do driver morreu: liberta os recursos
+            self.logger.warning(f"Sessão do WhatsApp perdida: {str(e)[:100]}", source=SOURCE)
+            self._close_sender()
+            return False, "Navegador fechado"
+
+        if "web.whatsapp.com" not in current_url:
+            return False, "Página do WhatsApp não está aberta"
+        if not sender.is_logged_in:
+            return False, "Sessão sem login"
+        return True, ""
+
+    def acquire(self, sender) -> Tuple[bool, str]:
+        # Uma campanha vai usar a sessão: não pode ser fechada por inatividade
+        with self._lock:
+            self._cancel_timer()
+            if sender is not self._sender and self._sender is not None:
+                self._close_sender()
+            self._sender = sender
+            self._busy = True
+        return self.check_health()
+
+    def release(self):
+        with self._lock:
+            self._busy = False
+            if self._sender is not None:
+                self._schedule_idle_close()
+
+    def shutdown(self, keep_browser: bool = False):
+        with self._lock:
+            self._cancel_timer()
+            self._busy = False
+            if keep_browser and self._sender is not None and hasattr(self._sender, "release_browser"):
+                # O navegador fica aberto para a próxima execução se ligar a ele
+                sender, self._sender = self._sender, None
+                sender.release_browser()
+            else:
+                self._close_sender()
+
+    def _schedule_idle_close(self):
+        self._cancel_timer()
+        if self.idle_timeout <= 0:
+            return
+        self._timer = threading.Timer(self.idle_timeout, self._on_idle_timeout)
+        self._timer.daemon = True
+        self._timer.start()
+        self.logger.debug(f"Sessão do WhatsApp mantida aberta ({self.idle_timeout / 60:.0f} min)", source=SOURCE)
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _on_idle_timeout(self):
+        with self._lock:
+            self._timer = None
+            if self._busy or self._sender is None:
+                return
+            self.logger.info("Sessão do WhatsApp inativa, a fechar o navegador...", source=SOURCE)
+            self._close_sender()
+
+    def _close_sender(self):
+        with self._lock:
+            sender = self._sender
+            self._sender = None
+        if sender is None:
+            return
+        try:
+            sender.close()
+        except Exception as e:
+            self.logger.error("Erro ao encerrar WhatsApp", error=e, source=SOURCE)
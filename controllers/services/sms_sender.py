@@ -1,6 +1,6 @@
 import re
 import time
-from typing import Optional, Callable, List, Generator
+from typing import Optional, Callable, List, Generator, Set
 from datetime import datetime
 from dataclasses import dataclass
 
@@ -69,7 +69,7 @@ class SMS_Sender:
     
     def _get_screen_resolution(self):
         try:
-            result = self.adb_manager.run_adb("shell", "wm", "size")
+            result = self.adb_manager.run_shell("wm", "size")
             if result.returncode == 0:
                 match = re.search(r'(\d+)x(\d+)', result.stdout)
                 if match:
@@ -89,8 +89,8 @@ class SMS_Sender:
         projection: str = "address,body,type,date"
     ) -> Optional[str]:
         try:
-            result = self.adb_manager.run_adb(
-                "shell", "content", "query",
+            result = self.adb_manager.run_shell(
+                "content", "query",
                 "--uri", uri,
                 "--projection", projection,
                 "--sort", "date DESC"
@@ -221,6 +221,22 @@ class SMS_Sender:
             self.logger.error("Erro ao verificar PARAR", error=e, source=SOURCE)
             return False
     
+    def get_stop_responders(self) -> Set[str]:
+        # Uma única query à caixa de entrada para todos os contactos da campanha
+        responders: Set[str] = set()
+        try:
+            for msg in self._iter_sms_messages(
+                uri="content://sms/inbox",
+                projection="address,body"
+            ):
+                if msg.body.upper().strip() == 'PARAR':
+                    responders.add(msg.address_normalized)
+        except Exception as e:
+            self.logger.error("Erro ao verificar PARAR", error=e, source=SOURCE)
+        
+        self.logger.debug(f"{len(responders)} número(s) pediram para parar", source=SOURCE)
+        return responders
+    
     def get_last_messages(self, phone: str, limit: int = 10) -> List[SMSMessage]:
         target_norm = Contact.normalize_phone(phone)
         self.logger.debug(
@@ -261,10 +277,7 @@ class SMS_Sender:
         
     def _count_sent_sms(self) -> int:
         try:
-            result = self.adb_manager.run_adb(
-                "shell",
-                "content query --uri content://sms/sent"
-            )
+            result = self.adb_manager.run_shell("content query --uri content://sms/sent")
             if result.returncode == 0:
                 count = result.stdout.count("Row:")
                 self.logger.debug(f"Contagem SMS = {count}", source=SOURCE)
@@ -294,8 +307,7 @@ class SMS_Sender:
             
             self.logger.info("A abrir aplicação de mensagens...", source=SOURCE)
             
-            result = self.adb_manager.run_adb(
-                "shell",
+            result = self.adb_manager.run_shell(
                 f'am start -a android.intent.action.SENDTO -d sms:{phone_clean} '
                 f'--es sms_body "{message_escaped}" --ez exit_on_sent true'
             )
@@ -320,7 +332,7 @@ class SMS_Sender:
                 self.logger.info(log_msg, source=SOURCE)
                 x = int(width * x_ratio)
                 y = int(height * y_ratio)
-                self.adb_manager.run_adb("shell", "input", "tap", str(x), str(y))
+                self.adb_manager.run_shell("input", "tap", str(x), str(y))
                 time.sleep(2)
                 
                 count_after = self._count_sent_sms()
@@ -329,18 +341,18 @@ class SMS_Sender:
                         f"SMS enviado! ({count_after - count_before} novo)", 
                         source=SOURCE
                     )
-                    self.adb_manager.run_adb("shell", "input", "keyevent", "3")
+                    self.adb_manager.run_shell("input", "keyevent", "3")
                     return True
                 
                 self.logger.warning(f"{log_msg.split(':')[0]} falhou.", source=SOURCE)
             
             self.logger.warning("Todas as tentativas falharam", source=SOURCE)
-            self.adb_manager.run_adb("shell", "input", "keyevent", "3")
+            self.adb_manager.run_shell("input", "keyevent", "3")
             return False
             
         except Exception as e:
             try:
-                self.adb_manager.run_adb("shell", "input", "keyevent", "3")
+                self.adb_manager.run_shell("input", "keyevent", "3")
             except Exception:
                 pass
             self.logger.error("Erro no envio SMS", error=e, source=SOURCE)
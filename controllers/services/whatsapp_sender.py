@@ -1,5 +1,7 @@
 import time
 import os
+import re
+import math
 import psutil
 import requests
 from selenium import webdriver
@@ -8,28 +10,548 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.edge.service import Service
 from selenium.webdriver.edge.options import Options
-from selenium.common.exceptions import TimeoutException, WebDriverException
-from typing import Optional, Tuple, Any
+from selenium.common.exceptions import TimeoutException, WebDriverException, JavascriptException
+from typing import Optional, Tuple, Any, List, Dict, Set
 from dataclasses import dataclass
 from datetime import datetime
 from utils.logger import get_logger
 from models.Result import Result, statusType, messageType
 from models.contact import Contact
+from controllers.services.invalid_number_cache import InvalidNumberCache
+from controllers.services.wpp_bundle_cache import WppBundleCache
+from controllers.services.process_registry import ProcessRegistry
+from controllers.services.driver_resolver import EdgeDriverResolver
+from controllers.services.cdp_channel import CdpChannel, CdpError, CdpScriptError, CdpTimeout
+from utils.environment import get_base_dir
 
 SOURCE = "WhatsApp_Sender"
 
 class WhatsAppSender:    
     WHATSAPP_URL = "https://web.whatsapp.com"
     WPP_JS_URL = "https://github.com/wppconnect-team/wa-js/releases/download/nightly/wppconnect-wa.js"
+    WPP_JS_MAX_AGE_HOURS = 24  # Intervalo entre verificações de nova versão
+    DEBUG_PORT = 9225  # Porta de depuração reservada ao perfil desta aplicação
     
-    def __init__(self):
+    # Modo de poucos recursos: recursos que não fazem falta para enviar texto
+    BLOCKED_URL_PATTERNS = [
+        "*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp", "*.ico",
+        "*.mp4", "*.webm", "*.ogg", "*.mp3", "*.opus",
+        "*.woff", "*.woff2", "*.ttf", "*.otf",
+        "*mmg.whatsapp.net*",   # Media das conversas
+        "*pps.whatsapp.net*",   # Fotos de perfil
+    ]
+    LOW_RESOURCE_ARGS = [
+        "--blink-settings=imagesEnabled=false",
+        "--autoplay-policy=user-gesture-required",
+        "--mute-audio",
+        "--disable-extensions",
+        "--disable-background-networking",
+        "--disable-component-update",
+    ]
+    
+    # Prazos de cada etapa do envio, aplicados dentro da página (segundos)
+    EXISTS_TIMEOUT = 15
+    HISTORY_TIMEOUT = 15
+    SEND_TIMEOUT = 20
+    # Limite do WebDriver para uma chamada completa (validar + PARAR + enviar)
+    SCRIPT_TIMEOUT = 60
+    
+    # Validação em lote: pedidos em paralelo na página e números por chamada
+    VALIDATE_CONCURRENCY = 8
+    VALIDATE_CHUNK = 100
+    
+    # Prontidão orientada a eventos (limites máximos, em segundos)
+    PAGE_READY_TIMEOUT = 60
+    WPP_READY_TIMEOUT = 50
+    MAIN_READY_TIMEOUT = 15
+    
+    # Varrimento de PARAR antes da campanha: conversas mais recentes e antiguidade máxima
+    OPT_OUT_SCAN_MAX_CHATS = 500
+    OPT_OUT_SCAN_DAYS = 90
+    OPT_OUT_SCAN_TIMEOUT = 120
+    
+    # Estados em que a mensagem de certeza não foi enviada
+    UNSENT_STATUSES = ('no_helper', 'not_ready', 'unavailable')
+    # Destes, só a página sem API se resolve recuperando-a; 'unavailable' (exists sem resposta) não
+    RECOVERABLE_STATUSES = ('no_helper', 'not_ready')
+    # Após uma recuperação falhada, os envios seguintes falham logo durante este tempo (segundos)
+    RECOVERY_BACKOFF = 30
+    
+    # Resolve no evento 'load' e na criação do chunk do webpack do WhatsApp
+    PAGE_READY_JS = """
+        var callback = arguments[arguments.length - 1];
+        var timeoutMs = arguments[0];
+        var t0 = performance.now();
+        var timings = {};
+        var chunkName = 'webpackChunkwhatsapp_web_client';
+        
+        function ms() { return Math.round(performance.now() - t0); }
+        
+        function documentReady() {
+            if (document.readyState === 'complete') {
+                return Promise.resolve('already');
+            }
+            return new Promise(function(resolve) {
+                window.addEventListener('load', function() { resolve('event'); }, {once: true});
+            });
+        }
+        
+        function modulesReady() {
+            if (typeof window.require !== 'undefined' || typeof window[chunkName] !== 'undefined') {
+                return Promise.resolve('already');
+            }
+            // Armadilha na propriedade: resolve no instante em que o WhatsApp a cria
+            return new Promise(function(resolve) {
+                var value;
+                try {
+                    Object.defineProperty(window, chunkName, {
+                        configurable: true,
+                        get: function() { return value; },
+                        set: function(v) {
+                            Object.defineProperty(window, chunkName, {
+                                configurable: true, writable: true, enumerable: true, value: v
+                            });
+                            resolve('event');
+                        }
+                    });
+                } catch (e) {
+                    resolve('unavailable');
+                }
+            });
+        }
+        
+        var timer = setTimeout(function() {
+            callback({success: false, error: 'timeout', timings: timings, total_ms: ms()});
+        }, timeoutMs);
+        
+        documentReady().then(function(how) {
+            timings.document_ms = ms();
+            timings.document = how;
+            return modulesReady();
+        }).then(function(how) {
+            timings.modules_ms = ms();
+            timings.modules = how;
+            clearTimeout(timer);
+            callback({success: true, timings: timings, total_ms: ms()});
+        });
+    """
+    
+    # Resolve no evento de webpack pronto e depois em 'conn.main_ready' (lista de conversas carregada)
+    WPP_READY_JS = """
+        var callback = arguments[arguments.length - 1];
+        var timeoutMs = arguments[0];
+        var mainTimeoutMs = arguments[1];
+        var t0 = performance.now();
+        var timings = {};
+        var finished = false;
+        
+        function ms() { return Math.round(performance.now() - t0); }
+        
+        function finish(result) {
+            if (finished) return;
+            finished = true;
+            result.timings = timings;
+            result.total_ms = ms();
+            callback(result);
+        }
+        
+        if (typeof WPP === 'undefined') {
+            finish({success: false, error: 'WPP undefined'});
+            return;
+        }
+        
+        function waitEvent(name, isDone, subscribe) {
+            return new Promise(function(resolve) {
+                if (isDone()) {
+                    resolve('already');
+                    return;
+                }
+                try {
+                    subscribe(function() { resolve('event'); });
+                } catch (e) {
+                    resolve('unavailable');
+                }
+            });
+        }
+        
+        function webpackReady() {
+            return waitEvent('webpack.ready', function() { return WPP.isReady === true; }, function(done) {
+                if (WPP.webpack && typeof WPP.webpack.onReady === 'function') {
+                    WPP.webpack.onReady(done);
+                } else {
+                    WPP.on('webpack.ready', done);
+                }
+            });
+        }
+        
+        function mainReady() {
+            var isMainReady = function() {
+                try {
+                    return !!(WPP.conn && typeof WPP.conn.isMainReady === 'function' && WPP.conn.isMainReady());
+                } catch (e) {
+                    return false;
+                }
+            };
+            var event = waitEvent('conn.main_ready', isMainReady, function(done) {
+                WPP.on('conn.main_ready', done);
+            });
+            var limit = new Promise(function(resolve) { setTimeout(function() { resolve('timeout'); }, mainTimeoutMs); });
+            return Promise.race([event, limit]);
+        }
+        
+        setTimeout(function() {
+            var hasAPI = !!(WPP.contact && typeof WPP.contact.queryExists === 'function');
+            finish({success: hasAPI, method: 'fallback', hasAPI: hasAPI, isReady: WPP.isReady});
+        }, timeoutMs);
+        
+        try {
+            if (!WPP.isReady && WPP.webpack && typeof WPP.webpack.injectLoader === 'function') {
+                WPP.webpack.injectLoader();
+            }
+        } catch (e) {
+            console.log('injectLoader error:', e);
+        }
+        
+        webpackReady().then(function(how) {
+            timings.webpack_ms = ms();
+            timings.webpack = how;
+            return mainReady();
+        }).then(function(how) {
+            timings.main_ms = ms();
+            timings.main = how;
+            finish({success: true, method: timings.webpack === 'already' ? 'already_ready' : 'event'});
+        });
+    """
+    
+    HELPER_VERSION = 7
+    # Biblioteca instalada na página uma vez: cada envio passa a ser uma única chamada
+    # (expressão de função; recebe a versão como argumento)
+    HELPER_JS = """
+        (function(version) {
+            if (window.__cmHelper && window.__cmHelper.version === version) {
+                return true;
+            }
+            
+            function withTimeout(promise, ms, label) {
+                return new Promise(function(resolve, reject) {
+                    var timer = setTimeout(function() { reject(new Error('timeout:' + label)); }, ms);
+                    Promise.resolve(promise).then(
+                        function(value) { clearTimeout(timer); resolve(value); },
+                        function(err) { clearTimeout(timer); reject(err); }
+                    );
+                });
+            }
+            
+            function isTimeout(err) {
+                return String((err && err.message) || err).indexOf('timeout:') === 0;
+            }
+            
+            function isOptOut(body) {
+                return String(body || '').trim().toUpperCase() === 'PARAR';
+            }
+            
+            async function resolvePhoneId(wid) {
+                var id = (wid && wid._serialized) || String(wid || '');
+                // Contas com LID: tenta obter o número de telefone associado
+                if (id.indexOf('@lid') !== -1 && WPP.contact.getPnLidEntry) {
+                    try {
+                        var entry = await WPP.contact.getPnLidEntry(id);
+                        if (entry && entry.phoneNumber) {
+                            return entry.phoneNumber._serialized || String(entry.phoneNumber);
+                        }
+                    } catch (e) {}
+                }
+                return id;
+            }
+            
+            function lastInbound(msgs) {
+                for (var i = msgs.length - 1; i >= 0; i--) {
+                    var m = msgs[i];
+                    if (!(m.id && m.id.fromMe) && !m.fromMe) {
+                        return m;
+                    }
+                }
+                return null;
+            }
+            
+            function loadedMessages(chat) {
+                if (!chat.msgs) {
+                    return [];
+                }
+                return chat.msgs.getModelsArray ? chat.msgs.getModelsArray() : (chat.msgs.models || []);
+            }
+            
+            async function lastReceived(chatId, ms) {
+                var msgs = await withTimeout(WPP.chat.getMessages(chatId, {count: 10}), ms, 'history');
+                var received = msgs.filter(function(m) { return !m.fromMe; }).reverse();
+                return received.length > 0 ? (received[0].body || received[0].content || '') : null;
+            }
+            
+            // Filas de eventos para o Python; sobrevivem a reinstalações no mesmo documento.
+            // Cada evento tem um número de sequência: só sai da fila quando o Python o confirma
+            window.__cmEventsDoc = window.__cmEventsDoc || (Date.now().toString(36) + Math.random().toString(36).slice(2));
+            window.__cmEventSeq = window.__cmEventSeq || 0;
+            window.__cmOptOuts = window.__cmOptOuts || [];
+            window.__cmAckEvents = window.__cmAckEvents || {};  // id da mensagem -> {ack, seq}
+            window.__cmTracked = window.__cmTracked || {};      // mensagens enviadas por esta aplicação
+            
+            window.__cmHelper = {
+                version: version,
+                withTimeout: withTimeout,
+                isTimeout: isTimeout,
+                
+                watchEvents: function() {
+                    // Subscrição única por documento; a página empurra, o Python recolhe em lote
+                    if (window.__cmWatching) {
+                        return true;
+                    }
+                    if (typeof WPP === 'undefined' || typeof WPP.on !== 'function') {
+                        return false;
+                    }
+                    WPP.on('chat.new_message', function(msg) {
+                        try {
+                            if (!msg || (msg.id && msg.id.fromMe) || msg.fromMe || !isOptOut(msg.body)) {
+                                return;
+                            }
+                            resolvePhoneId(msg.from).then(function(id) {
+                                window.__cmOptOuts.push({id: id, at: Date.now(), seq: ++window.__cmEventSeq});
+                            });
+                        } catch (e) {}
+                    });
+                    // Confirmações de entrega/leitura (1 enviada, 2 entregue, 3 lida, 4 ouvida)
+                    WPP.on('chat.msg_ack_change', function(event) {
+                        try {
+                            (event.ids || []).forEach(function(id) {
+                                var key = (id && id._serialized) || String(id);
+                                if (!window.__cmTracked[key]) {
+                                    return;
+                                }
+                                var previous = window.__cmAckEvents[key];
+                                window.__cmAckEvents[key] = {
+                                    ack: Math.max((previous && previous.ack) || 0, event.ack),
+                                    seq: ++window.__cmEventSeq
+                                };
+                                if (event.ack >= 3) {
+                                    delete window.__cmTracked[key];  // Estado final para texto
+                                }
+                            });
+                        } catch (e) {}
+                    });
+                    window.__cmWatching = true;
+                    return true;
+                },
+                
+                drainEvents: function(confirmed) {
+                    // Descarta só o que o Python confirmou ({doc, seq} da recolha anterior): uma
+                    // resposta perdida devolve os mesmos eventos na recolha seguinte
+                    var seq = (confirmed && confirmed.doc === window.__cmEventsDoc) ? confirmed.seq : 0;
+                    window.__cmOptOuts = window.__cmOptOuts.filter(function(e) { return e.seq > seq; });
+                    var acks = {};
+                    Object.keys(window.__cmAckEvents).forEach(function(key) {
+                        var entry = window.__cmAckEvents[key];
+                        if (entry.seq <= seq) {
+                            delete window.__cmAckEvents[key];
+                        } else {
+                            acks[key] = entry.ack;
+                        }
+                    });
+                    return {
+                        optOuts: window.__cmOptOuts.slice(),
+                        acks: acks,
+                        doc: window.__cmEventsDoc,
+                        seq: window.__cmEventSeq
+                    };
+                },
+                
+                validateMany: async function(phoneIds, concurrency, timeoutMs) {
+                    if (typeof WPP === 'undefined' || !WPP.isReady) {
+                        return null;
+                    }
+                    var results = new Array(phoneIds.length);
+                    var next = 0;
+                    
+                    async function worker() {
+                        while (next < phoneIds.length) {
+                            var index = next++;
+                            var phoneId = phoneIds[index];
+                            try {
+                                var info = await withTimeout(WPP.contact.queryExists(phoneId), timeoutMs, 'exists');
+                                results[index] = {
+                                    phone: phoneId,
+                                    exists: !!info,
+                                    id: (info && info.wid && info.wid._serialized) || null
+                                };
+                            } catch (e) {
+                                results[index] = {phone: phoneId, exists: null, error: isTimeout(e) ? 'timeout' : String(e)};
+                            }
+                        }
+                    }
+                    
+                    var workers = [];
+                    for (var w = 0; w < Math.max(1, Math.min(concurrency, phoneIds.length)); w++) {
+                        workers.push(worker());
+                    }
+                    await Promise.all(workers);
+                    return results;
+                },
+                
+                scanOptOuts: async function(opts) {
+                    if (typeof WPP === 'undefined' || !WPP.isReady) {
+                        return null;
+                    }
+                    var since = opts.sinceSeconds || 0;
+                    var chats = (await withTimeout(WPP.chat.list({onlyUsers: true}), opts.timeoutMs, 'list'))
+                        .filter(function(c) { return !since || (c.t || 0) >= since; })
+                        .sort(function(a, b) { return (b.t || 0) - (a.t || 0); })
+                        .slice(0, opts.maxChats);
+                    
+                    var found = [];
+                    var fetched = 0;
+                    var errors = 0;
+                    var next = 0;
+                    
+                    async function worker() {
+                        while (next < chats.length) {
+                            var chat = chats[next++];
+                            var chatId = chat.id && chat.id._serialized;
+                            try {
+                                // Sem mensagens recebidas: nada a verificar
+                                if (chat.lastReceivedKey === null) {
+                                    continue;
+                                }
+                                var msg = null;
+                                if (chat.lastReceivedKey && chat.msgs && chat.msgs.get) {
+                                    msg = chat.msgs.get(chat.lastReceivedKey) || null;
+                                }
+                                if (!msg && chat.lastReceivedKey === undefined) {
+                                    msg = lastInbound(loadedMessages(chat));
+                                }
+                                // Mensagem ainda não carregada na página: pede as últimas
+                                if (!msg) {
+                                    fetched++;
+                                    var msgs = await withTimeout(WPP.chat.getMessages(chatId, {count: 10}), opts.timeoutMs, 'history');
+                                    msg = lastInbound(msgs);
+                                }
+                                if (msg && isOptOut(msg.body || msg.content)) {
+                                    found.push(await resolvePhoneId(chat.id));
+                                }
+                            } catch (e) {
+                                errors++;
+                            }
+                        }
+                    }
+                    
+                    var workers = [];
+                    for (var w = 0; w < Math.max(1, Math.min(opts.concurrency, chats.length)); w++) {
+                        workers.push(worker());
+                    }
+                    await Promise.all(workers);
+                    return {scanned: chats.length, fetched: fetched, errors: errors, found: found};
+                },
+                
+                sendChecked: async function(phoneId, message, opts) {
+                    // Página recarregada a meio: nada foi enviado, o Python recupera e repete
+                    if (typeof WPP === 'undefined' || !WPP.isReady) {
+                        return {status: 'not_ready'};
+                    }
+                    
+                    var t = opts.timeouts;
+                    var info;
+                    try {
+                        info = await withTimeout(WPP.contact.queryExists(phoneId), t.exists, 'exists');
+                    } catch (e) {
+                        // Falha da infraestrutura, não prova que o número é inválido
+                        return {status: 'unavailable', stage: 'exists', error: isTimeout(e) ? 'timeout' : String(e)};
+                    }
+                    if (!info) {
+                        return {status: 'invalid', stage: 'exists'};
+                    }
+                    
+                    var chatId = (info.wid && info.wid._serialized) || phoneId;
+                    var historyError = null;
+                    
+                    if (opts.checkStop) {
+                        try {
+                            var last = await lastReceived(chatId, t.history);
+                            if (last && isOptOut(last)) {
+                                return {status: 'stopped', id: chatId};
+                            }
+                        } catch (e) {
+                            historyError = String(e);
+                        }
+                    }
+                    
+                    try {
+                        var sent = await withTimeout(WPP.chat.sendTextMessage(chatId, message), t.send, 'send');
+                        var msgId = sent && sent.id ? (sent.id._serialized || String(sent.id)) : null;
+                        if (msgId) {
+                            window.__cmTracked[msgId] = true;
+                        }
+                        return {status: 'sent', id: chatId, msgId: msgId, historyError: historyError};
+                    } catch (e) {
+                        return {
+                            status: 'error', stage: 'send', id: chatId, historyError: historyError,
+                            error: isTimeout(e) ? 'timeout' : String(e)
+                        };
+                    }
+                }
+            };
+            return true;
+        })
+    """
+    
+    def __init__(
+        self,
+        invalid_cache: Optional[InvalidNumberCache] = None,
+        low_resource: Optional[bool] = None,
+        headless: Optional[bool] = None,
+        cdp_channel: Optional[bool] = None
+    ):
         self.driver: Optional[webdriver.Edge] = None 
         self.session_dir = os.path.abspath(
             os.path.join(os.path.expanduser("~"), ".whatsapp_edge_session_fast")
         )
         self.logger = get_logger()
-        self._invalid_numbers: set = set()
+        # PIDs do driver e do navegador lançados por esta aplicação
+        self._processes = ProcessRegistry(self.session_dir)
+        # Números sem WhatsApp, persistidos entre sessões (com prazo de validade)
+        self._invalid_numbers = invalid_cache if invalid_cache is not None else InvalidNumberCache.load_default()
         self._wpp_js_cache: Optional[str] = None
+        self._scripts_registered = False  # WPP.js registado via CDP no início de cada documento
+        self.last_ready_timings: dict = {}  # Tempos da última espera pela prontidão (ms)
+        self._attached = False  # Driver ligado a um Edge que não foi lançado por ele
+        self.page_recoveries = 0
+        # Último envio parou por falta da API: o chamador recupera a página numa chamada própria
+        self.page_needs_recovery = False
+        self.send_retryable = False  # O envio que pediu a recuperação não chegou a sair
+        # Pedidos de paragem recebidos por eventos da página (dígitos, com indicativo)
+        self._opted_out: Set[str] = set()
+        self._new_opt_outs: Set[str] = set()  # Ainda não devolvidos por poll_opt_outs
+        self._opt_out_listening = False
+        self._pending_acks: Dict[str, int] = {}  # id da mensagem -> ack, à espera do controller
+        self._events_confirmed: Optional[dict] = None  # Última recolha de eventos ({doc, seq}) a confirmar à página
+        self._recovery_backoff_until = 0.0
+        # Canal CDP direto para as chamadas frequentes (o Selenium fica para o ciclo de vida)
+        self._cdp_channel: Optional[CdpChannel] = None
+        self._cdp_disabled = False
+        
+        if low_resource is None or headless is None or cdp_channel is None:
+            from controllers.services.config_service import ConfigService
+            config = ConfigService.create_default_config(get_base_dir())
+            if low_resource is None:
+                low_resource = config.get("whatsapp_low_resource", False)
+            if headless is None:
+                headless = config.get("whatsapp_headless", False)
+            if cdp_channel is None:
+                cdp_channel = config.get("whatsapp_cdp_channel", True)
+        self.low_resource = bool(low_resource)
+        self.headless = bool(headless)
+        self.use_cdp_channel = bool(cdp_channel)
+        self._wpp_bundle = WppBundleCache(
+            get_base_dir() / "data" / "wpp",
+            self.WPP_JS_URL,
+            max_age_hours=self.WPP_JS_MAX_AGE_HOURS
+        )
 
     def initialize(self, **kwargs) -> Tuple[bool, str]:
         return self._initialize_internal()
@@ -61,6 +583,14 @@ class WhatsAppSender:
     ) -> Result:
         return self.send_message(phone, message, contact_name, message_type)
 
+    @property
+    def invalid_numbers(self) -> InvalidNumberCache:
+        return self._invalid_numbers
+
+    @property
+    def opted_out_numbers(self) -> Set[str]:
+        return self._opted_out
+
     @property
     def is_logged_in(self) -> bool:
         if not self.driver: 
@@ -74,31 +604,50 @@ class WhatsAppSender:
             return False
 
     def _kill_specific_session_processes(self):
+        # Só os processos registados por esta aplicação (identidade confirmada pelo create_time)
         self.logger.debug("Encerrando processos anteriores...", source=SOURCE)
+        killed = self._processes.terminate_all()
+        if killed > 0:
+            self.logger.debug(f"{killed} processo(s) encerrado(s)", source=SOURCE)
+
+    def _kill_profile_processes(self):
+        # Último recurso quando o perfil está bloqueado por um Edge sem registo
         target_folder = os.path.basename(self.session_dir).lower()
-        killed = 0
-        
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
+        targets = []
+        for proc in psutil.process_iter(['name']):
             try:
-                p_info = proc.info
-                p_name = (p_info.get('name') or "").lower()
-                p_cmd = " ".join(p_info.get('cmdline') or []).lower()
-                
-                if 'msedgedriver' in p_name:
-                    proc.kill()
-                    killed += 1
+                p_name = (proc.info.get('name') or "").lower()
+                if 'msedge' not in p_name or 'msedgedriver' in p_name:
                     continue
-                
-                if ('msedge' in p_name or 'webview' in p_name):
-                    if target_folder in p_cmd:
-                        proc.kill()
-                        killed += 1
-            except:
+                if target_folder in " ".join(proc.cmdline()).lower():
+                    targets.append(proc)
+            except psutil.Error:
                 continue
-                
-        if killed > 0:
-            self.logger.debug(f"{killed} processo(s) encerrado(s)", source=SOURCE)
-            time.sleep(2)
+        
+        for proc in targets:
+            try:
+                proc.kill()
+            except psutil.Error:
+                pass
+        psutil.wait_procs(targets, timeout=5)
+        if targets:
+            self.logger.debug(f"{len(targets)} processo(s) do perfil encerrado(s)", source=SOURCE)
+
+    def _record_processes(self, launched: bool):
+        try:
+            driver_proc = self.driver.service.process
+            if driver_proc is None:
+                return
+            self._processes.record("driver", driver_proc.pid)
+            if not launched:
+                return
+            # O processo principal do Edge é filho direto do msedgedriver
+            for child in psutil.Process(driver_proc.pid).children():
+                if 'msedge' in child.name().lower():
+                    self._processes.record("browser", child.pid)
+                    break
+        except Exception as e:
+            self.logger.debug(f"Não foi possível registar os processos: {e}", source=SOURCE)
 
     def _prepare_session(self):
         self.logger.debug(f"Preparando sessão em: {self.session_dir}", source=SOURCE)
@@ -119,14 +668,11 @@ class WhatsAppSender:
             self.logger.debug(f"Usando msedgedriver local: {local_driver}", source=SOURCE)
             return Service(executable_path=local_driver)
         
-        try:
-            self.logger.debug("A tentar webdriver-manager...", source=SOURCE)
-            from webdriver_manager.microsoft import EdgeChromiumDriverManager
-            driver_path = EdgeChromiumDriverManager().install()
-            self.logger.debug(f"Driver obtido: {driver_path}", source=SOURCE)
+        # Caminho em cache por versão do Edge: só volta à rede quando o Edge é atualizado
+        resolver = EdgeDriverResolver(get_base_dir() / "data" / "edge_driver.json")
+        driver_path = resolver.resolve()
+        if driver_path:
             return Service(executable_path=driver_path)
-        except Exception as e:
-            self.logger.warning(f"WebDriver Manager falhou: {e}", source=SOURCE)
         
         self.logger.debug("Usando Service padrão (PATH do sistema)", source=SOURCE)
         return Service()
@@ -135,6 +681,11 @@ class WhatsAppSender:
         try:
             self.logger.info("Iniciando o WhatsApp Sender.", source=SOURCE)
             
+            # Navegador da sessão ainda aberto (ex: reinício da aplicação): reutiliza-o
+            if self._attach_existing():
+                self.logger.info("Ligado ao navegador já aberto", source=SOURCE)
+                return True, "Ligado ao navegador existente"
+            
             self._kill_specific_session_processes()
             self._prepare_session()
             
@@ -142,7 +693,7 @@ class WhatsAppSender:
             options = Options()
             options.add_argument(f"--user-data-dir={self.session_dir}")
             options.add_argument("--profile-directory=Default")
-            options.add_argument("--remote-debugging-port=9225")
+            options.add_argument(f"--remote-debugging-port={self.DEBUG_PORT}")
             options.add_argument("--disable-gpu")
             options.add_argument("--no-sandbox")
             options.add_argument("--disable-dev-shm-usage")
@@ -151,6 +702,14 @@ class WhatsAppSender:
             options.add_argument("--log-level=3")
             options.add_argument("--silent")
             
+            if self.low_resource:
+                for arg in self.LOW_RESOURCE_ARGS:
+                    options.add_argument(arg)
+            if self.headless:
+                # Só funciona com a sessão já autenticada: o QR code não fica visível
+                options.add_argument("--headless=new")
+                options.add_argument("--window-size=1280,900")
+            
             options.add_experimental_option("detach", True)
             options.add_experimental_option('excludeSwitches', ['enable-logging', 'enable-automation'])
 
@@ -163,23 +722,29 @@ class WhatsAppSender:
             except Exception as e:
                 if "user data" in str(e).lower():
                     self.logger.warning("Conflito detectado, a tentar novamente...", source=SOURCE)
-                    self._kill_specific_session_processes()
-                    time.sleep(2)
+                    self._kill_profile_processes()
                     self.driver = webdriver.Edge(service=service, options=options)
                 else:
                     raise
             
+            self._record_processes(launched=True)
+            self._apply_low_resource_settings()
+            
             self.driver.set_page_load_timeout(60)
             self.driver.set_script_timeout(30)
             self.driver.implicitly_wait(10)
             
+            # Antes de abrir a página, para que o primeiro carregamento já inclua o WPP.js
+            self._register_document_scripts()
+            
             self.logger.info("Abrindo WhatsApp Web...", source=SOURCE)
             self.driver.get(self.WHATSAPP_URL)
             
-            try:
-                self.driver.minimize_window()
-            except:
-                pass
+            if not self.headless:
+                try:
+                    self.driver.minimize_window()
+                except:
+                    pass
             
             self.logger.info("Navegador iniciado com sucesso!", source=SOURCE)
             return True, "Navegador Iniciado"
@@ -193,22 +758,286 @@ class WhatsAppSender:
             self.logger.error(f"Erro: {error_msg}", source=SOURCE)
             return False, error_msg
 
+    def _apply_low_resource_settings(self):
+        if self.driver is None or not hasattr(self.driver, "execute_cdp_cmd"):
+            return
+        
+        if self.headless:
+            # O WhatsApp Web recusa o user agent "HeadlessEdg"
+            try:
+                user_agent = self.driver.execute_cdp_cmd("Browser.getVersion", {}).get("userAgent", "")
+                if "Headless" in user_agent:
+                    self.driver.execute_cdp_cmd("Network.setUserAgentOverride", {
+                        "userAgent": user_agent.replace("HeadlessEdg", "Edg").replace("Headless", "")
+                    })
+            except Exception as e:
+                self.logger.warning(f"Não foi possível ajustar o user agent: {e}", source=SOURCE)
+        
+        if not self.low_resource:
+            return
+        
+        # Bloqueio no próprio navegador (sem interceção pedido a pedido a partir do Python)
+        try:
+            self.driver.execute_cdp_cmd("Network.enable", {})
+            self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.BLOCKED_URL_PATTERNS})
+            self.logger.debug("Modo de poucos recursos: imagens, media e fontes bloqueados", source=SOURCE)
+        except Exception as e:
+            self.logger.warning(f"Modo de poucos recursos indisponível: {e}", source=SOURCE)
+
+    def get_memory_usage(self) -> Dict[str, Optional[float]]:
+        # RSS de todos os processos do navegador e heap JS da página (MB)
+        usage: Dict[str, Optional[float]] = {"rss_mb": None, "heap_mb": None}
+        if self.driver is None:
+            return usage
+        
+        roots = self._processes.live_processes("browser")
+        if not roots:
+            try:
+                roots = psutil.Process(self.driver.service.process.pid).children()
+            except Exception:
+                roots = []
+        
+        rss = 0
+        seen = set()
+        for root in roots:
+            try:
+                for proc in [root] + root.children(recursive=True):
+                    if proc.pid not in seen:
+                        seen.add(proc.pid)
+                        rss += proc.memory_info().rss
+            except psutil.Error:
+                continue
+        if seen:
+            usage["rss_mb"] = rss / (1024 * 1024)
+        
+        try:
+            heap = self.driver.execute_cdp_cmd("Runtime.getHeapUsage", {})
+            usage["heap_mb"] = heap.get("usedSize", 0) / (1024 * 1024)
+        except Exception:
+            pass
+        return usage
+
+    def recycle_page(self) -> bool:
+        # Nova navegação descarta o documento (e o heap) acumulado; o WPP volta pelo registo CDP
+        if self.driver is None:
+            return False
+        # As filas de eventos vivem no documento: recolhe-as antes de navegar (PARAR e confirmações)
+        self._drain_page_events()
+        try:
+            self.logger.info("A recarregar o WhatsApp Web para libertar memória...", source=SOURCE)
+            self.driver.get(self.WHATSAPP_URL)
+            return self._inject_wpp_js()
+        except Exception as e:
+            self.logger.error(f"Erro ao recarregar a página: {e}", source=SOURCE)
+            return False
+
+    def _focus_whatsapp_tab(self) -> bool:
+        for handle in self.driver.window_handles:
+            self.driver.switch_to.window(handle)
+            if "web.whatsapp.com" in (self.driver.current_url or ""):
+                return True
+        if self.driver.window_handles:
+            self.driver.switch_to.window(self.driver.window_handles[0])
+        return False
+
+    def _driver_alive(self) -> bool:
+        if self.driver is None:
+            return False
+        try:
+            return bool(self.driver.window_handles)
+        except Exception:
+            return False
+
+    def recover_page(self) -> bool:
+        self.page_needs_recovery = False
+        return self._recover_page()
+
+    def _recover_page(self) -> bool:
+        # Página recarregada, separador fechado ou WPP perdido: volta a deixar a API pronta
+        if self.driver is None or time.monotonic() < self._recovery_backoff_until:
+            return False
+        
+        self.logger.warning("Página do WhatsApp sem API, a recuperar...", source=SOURCE)
+        started = time.monotonic()
+        try:
+            if not self._focus_whatsapp_tab():
+                self.driver.get(self.WHATSAPP_URL)
+            recovered = self._inject_wpp_js()
+        except Exception as e:
+            self.logger.error(f"Erro ao recuperar a página: {str(e)[:100]}", source=SOURCE)
+            recovered = False
+        
+        if recovered:
+            self.page_recoveries += 1
+            self.logger.info(f"Página recuperada em {time.monotonic() - started:.1f}s", source=SOURCE)
+        else:
+            self._recovery_backoff_until = time.monotonic() + self.RECOVERY_BACKOFF
+        return recovered
+
+    def _debugger_available(self) -> bool:
+        try:
+            response = requests.get(f"http://127.0.0.1:{self.DEBUG_PORT}/json/version", timeout=1)
+            return response.ok and "webSocketDebuggerUrl" in response.json()
+        except Exception:
+            return False
+
+    def _debugger_owned_by_profile(self) -> bool:
+        # A porta pode estar a ser usada por outro navegador: só conta o Edge lançado com este perfil
+        session_dir = os.path.normcase(self.session_dir)
+        port_arg = f"--remote-debugging-port={self.DEBUG_PORT}"
+        for proc in psutil.process_iter(['name']):
+            try:
+                p_name = (proc.info.get('name') or "").lower()
+                if 'msedge' not in p_name or 'msedgedriver' in p_name:
+                    continue
+                cmdline = proc.cmdline()
+            except psutil.Error:
+                continue
+            if port_arg not in cmdline:
+                continue
+            for arg in cmdline:
+                if arg.startswith("--user-data-dir="):
+                    user_data_dir = arg.split("=", 1)[1].strip('"')
+                    if os.path.normcase(os.path.abspath(user_data_dir)) == session_dir:
+                        return True
+        return False
+
+    def _attach_existing(self) -> bool:
+        if not self._debugger_available():
+            return False
+        if not self._debugger_owned_by_profile():
+            self.logger.warning(
+                f"A porta {self.DEBUG_PORT} pertence a outro navegador: não é reutilizado",
+                source=SOURCE
+            )
+            return False
+        
+        self.logger.debug(f"Navegador encontrado na porta {self.DEBUG_PORT}, a ligar...", source=SOURCE)
+        try:
+            options = Options()
+            options.debugger_address = f"127.0.0.1:{self.DEBUG_PORT}"
+            service = self._get_edge_driver_service()
+            service.creation_flags = 0x08000000 | 0x00000008 | 0x00000200
+            self.driver = webdriver.Edge(service=service, options=options)
+            self._attached = True
+            self._record_processes(launched=False)
+        except Exception as e:
+            self.logger.warning(f"Não foi possível ligar ao navegador existente: {str(e)[:150]}", source=SOURCE)
+            self.driver = None
+            return False
+        
+        try:
+            # Procura o separador do WhatsApp; se não existir, abre-o no atual
+            whatsapp_tab = self._focus_whatsapp_tab()
+            
+            self.driver.set_page_load_timeout(60)
+            self.driver.set_script_timeout(30)
+            self.driver.implicitly_wait(10)
+            self._apply_low_resource_settings()
+            
+            # Os registos CDP pertencem à sessão anterior do driver: regista de novo para futuros recarregamentos
+            self._register_document_scripts()
+            
+            if not whatsapp_tab:
+                self.logger.info("Abrindo WhatsApp Web...", source=SOURCE)
+                self.driver.get(self.WHATSAPP_URL)
+            return True
+        except Exception as e:
+            self.logger.warning(f"Navegador existente inutilizável: {str(e)[:150]}", source=SOURCE)
+            self.release_browser()
+            return False
+
     def _download_wpp_js(self) -> Optional[str]:
         if self._wpp_js_cache:
             return self._wpp_js_cache
-            
-        self.logger.info("Baixando WPP.js...", source=SOURCE)
+        
+        # Cache em disco: só descarrega quando há versão nova (ou sem cópia local)
+        self._wpp_js_cache = self._wpp_bundle.get()
+        return self._wpp_js_cache
+
+    def _inject_wpp_js(self) -> bool:
+        # A página pode ter mudado de separador: o canal CDP volta a ligar ao atual
+        self._reset_cdp_channel()
+        return self._load_wpp_js() and self._install_helper()
+
+    def _helper_source(self) -> str:
+        return f"{self.HELPER_JS}({self.HELPER_VERSION});"
+
+    def _register_document_scripts(self) -> bool:
+        # Regista o WPP.js e a biblioteca auxiliar para correrem no início de cada documento:
+        # recarregar o WhatsApp Web deixa de exigir nova injeção
+        self._scripts_registered = False
+        if self.driver is None or not hasattr(self.driver, "execute_cdp_cmd"):
+            return False
+        
+        js_content = self._download_wpp_js()
+        if not js_content:
+            return False
+        
         try:
-            response = requests.get(self.WPP_JS_URL, timeout=30)
-            response.raise_for_status()
-            self._wpp_js_cache = response.text
-            self.logger.info(f"WPP.js baixado ({len(self._wpp_js_cache)} bytes)", source=SOURCE)
-            return self._wpp_js_cache
+            self.driver.execute_cdp_cmd("Page.enable", {})
+            self.driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": js_content})
+            self.driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": self._helper_source()})
+            self._scripts_registered = True
+            self.logger.debug("WPP.js registado no início do documento (CDP)", source=SOURCE)
+            return True
         except Exception as e:
-            self.logger.error(f"Erro ao baixar WPP.js: {e}", source=SOURCE)
-            return None
+            self.logger.warning(f"Registo CDP indisponível, será usada a injeção: {e}", source=SOURCE)
+            return False
 
-    def _inject_wpp_js(self) -> bool:
+    def _install_helper(self) -> bool:
+        if self.driver is None:
+            return False
+        try:
+            self.driver.execute_script(self._helper_source())
+            self._opt_out_listening = bool(self.driver.execute_script("return window.__cmHelper.watchEvents();"))
+            if not self._opt_out_listening:
+                self.logger.warning("Eventos de mensagens indisponíveis, PARAR verificado a cada envio", source=SOURCE)
+            # Definido uma vez: as chamadas de envio já não leem nem repõem o timeout
+            self.driver.set_script_timeout(self.SCRIPT_TIMEOUT)
+            self.logger.debug("Biblioteca auxiliar instalada na página", source=SOURCE)
+            return True
+        except Exception as e:
+            self.logger.error(f"Erro ao instalar biblioteca auxiliar: {e}", source=SOURCE)
+            return False
+
+    def _inject_bundle(self) -> bool:
+        # Baixa o JS
+        js_content = self._download_wpp_js()
+        if not js_content:
+            return False
+        
+        # Aguarda a página e os módulos do WhatsApp (eventos, numa única chamada)
+        self.logger.debug("Aguardando página e módulos do WhatsApp...", source=SOURCE)
+        try:
+            page = self._execute_async(
+                self.PAGE_READY_JS, self.PAGE_READY_TIMEOUT * 1000,
+                timeout=self.PAGE_READY_TIMEOUT + 5
+            ) or {}
+        except Exception as e:
+            page = {"success": False, "error": str(e)[:100]}
+        self.last_ready_timings["page"] = page.get("timings", {})
+        
+        if page.get("success"):
+            self.logger.debug(f"Página pronta em {page.get('total_ms')}ms ({page.get('timings')})", source=SOURCE)
+        else:
+            self.logger.warning(f"Página não confirmou prontidão ({page.get('error')}), a tentar mesmo assim...", source=SOURCE)
+        
+        # Injeta o script
+        self.logger.debug("Injetando WPP.js...", source=SOURCE)
+        self.driver.execute_script(js_content)
+        
+        # Verifica se WPP foi definido
+        wpp_exists = self.driver.execute_script("return typeof WPP !== 'undefined';")
+        self.logger.debug(f"WPP definido: {wpp_exists}", source=SOURCE)
+        
+        if not wpp_exists:
+            self.logger.error("WPP não foi definido após injeção", source=SOURCE)
+            return False
+        
+        return True
+
+    def _load_wpp_js(self) -> bool:
         if self.driver is None: 
             return False
             
@@ -224,100 +1053,34 @@ class WhatsAppSender:
             except:
                 pass
 
-            # Baixa o JS
-            js_content = self._download_wpp_js()
-            if not js_content:
-                return False
-            
-            # Aguarda a página estar completamente carregada
-            self.logger.debug("Aguardando página carregar completamente...", source=SOURCE)
-            for _ in range(30):
-                ready_state = self.driver.execute_script("return document.readyState;")
-                if ready_state == "complete":
-                    break
-                time.sleep(1)
-            
-            # Verifica se os módulos do WhatsApp estão carregados
-            self.logger.debug("Verificando módulos do WhatsApp...", source=SOURCE)
-            for i in range(30):
-                has_modules = self.driver.execute_script("""
-                    return typeof window.require !== 'undefined' || 
-                           typeof window.webpackChunkwhatsapp_web_client !== 'undefined';
-                """)
-                if has_modules:
-                    self.logger.debug(f"Módulos encontrados após {i+1}s", source=SOURCE)
-                    break
-                time.sleep(1)
-            else:
-                self.logger.warning("Módulos não encontrados, a tentar mesmo assim...", source=SOURCE)
-            
-            # Injeta o script
-            self.logger.debug("Injetando WPP.js...", source=SOURCE)
-            self.driver.execute_script(js_content)
-            time.sleep(2)
-            
-            # Verifica se WPP foi definido
-            wpp_exists = self.driver.execute_script("return typeof WPP !== 'undefined';")
-            self.logger.debug(f"WPP definido: {wpp_exists}", source=SOURCE)
-            
-            if not wpp_exists:
-                self.logger.error("WPP não foi definido após injeção", source=SOURCE)
+            # Com o registo CDP o WPP já existe na página; só falta esperar que fique pronto
+            wpp_defined = self._scripts_registered and self.driver.execute_script(
+                "return typeof WPP !== 'undefined';"
+            )
+            if wpp_defined:
+                self.logger.debug("WPP.js carregado com a página", source=SOURCE)
+            elif not self._inject_bundle():
                 return False
             
-            # Inicializa usando a Promise do webpack
-            self.logger.debug("Inicializando via WPP.webpack.isReady...", source=SOURCE)
-            
-            # Tenta inicializar de diferentes formas
-            init_result = self.driver.execute_script("""
-                return new Promise((resolve) => {
-                    if (typeof WPP === 'undefined') {
-                        resolve({success: false, error: 'WPP undefined'});
-                        return;
-                    }
-                    
-                    // Se já está pronto
-                    if (WPP.isReady) {
-                        resolve({success: true, method: 'already_ready'});
-                        return;
-                    }
-                    
-                    // Tenta injetar o loader
-                    try {
-                        if (WPP.webpack && typeof WPP.webpack.injectLoader === 'function') {
-                            WPP.webpack.injectLoader();
-                        }
-                    } catch(e) {
-                        console.log('injectLoader error:', e);
-                    }
-                    
-                    // Aguarda ficar pronto
-                    let attempts = 0;
-                    const checkReady = () => {
-                        attempts++;
-                        if (WPP.isReady) {
-                            resolve({success: true, method: 'polling', attempts: attempts});
-                        } else if (attempts < 100) {
-                            setTimeout(checkReady, 500);
-                        } else {
-                            // Verifica se as funções existem mesmo sem isReady
-                            const hasAPI = WPP.contact && typeof WPP.contact.queryExists === 'function';
-                            resolve({
-                                success: hasAPI, 
-                                method: 'fallback', 
-                                hasAPI: hasAPI,
-                                isReady: WPP.isReady
-                            });
-                        }
-                    };
-                    
-                    setTimeout(checkReady, 1000);
-                });
-            """)
+            # Aguarda os eventos de prontidão do WPP (sem sondagem a partir do Python)
+            self.logger.debug("Aguardando WPP ficar pronto...", source=SOURCE)
+            started = time.monotonic()
+            init_result = self._execute_async(
+                self.WPP_READY_JS, self.WPP_READY_TIMEOUT * 1000, self.MAIN_READY_TIMEOUT * 1000,
+                timeout=self.WPP_READY_TIMEOUT + 5
+            )
+            if init_result:
+                self.last_ready_timings["wpp"] = init_result.get("timings", {})
+                self.last_ready_timings["wpp_total_ms"] = init_result.get("total_ms")
+            self.last_ready_timings["round_trip_ms"] = round((time.monotonic() - started) * 1000)
             
             self.logger.debug(f"Resultado da inicialização: {init_result}", source=SOURCE)
             
             if init_result and init_result.get('success'):
-                self.logger.info(f"WPP.js pronto via {init_result.get('method')}", source=SOURCE)
+                self.logger.info(
+                    f"WPP.js pronto via {init_result.get('method')} em {init_result.get('total_ms')}ms",
+                    source=SOURCE
+                )
                 return True
             
             # Fallback: verifica se a API funciona
@@ -362,7 +1125,6 @@ class WhatsAppSender:
         try:
             if len(self.driver.find_elements(By.CSS_SELECTOR, '#pane-side')) > 0:
                 self.logger.info("Já está logado!", source=SOURCE)
-                time.sleep(3)
                 if self._inject_wpp_js():
                     return True, "Já logado e API Pronta"
                 return False, "Já logado mas falha na API"
@@ -372,6 +1134,9 @@ class WhatsAppSender:
         self.logger.info(f"Aguardando login (timeout: {timeout}s)...", source=SOURCE)
         self.logger.info("Escaneie o QR Code no celular", source=SOURCE)
         
+        if self.headless:
+            self.logger.warning("Modo sem janela: o QR code não é visível, faça o primeiro login com janela", source=SOURCE)
+        
         try:
             self.driver.maximize_window()
         except:
@@ -388,10 +1153,7 @@ class WhatsAppSender:
             except:
                 pass
             
-            # Espera mais tempo para o WhatsApp carregar completamente
-            self.logger.debug("Aguardando WhatsApp carregar...", source=SOURCE)
-            time.sleep(5)
-            
+            # A espera pelo carregamento completo é feita pelos eventos do WPP
             if self._inject_wpp_js():
                 self.logger.info("Pronto para enviar mensagens!", source=SOURCE)
                 return True, "Logado e API Pronta"
@@ -414,6 +1176,62 @@ class WhatsAppSender:
 
         return f"{raw}@c.us"
 
+    def _cdp(self) -> Optional[CdpChannel]:
+        if not self.use_cdp_channel or self._cdp_disabled or self.driver is None:
+            return None
+        if self._cdp_channel is None:
+            try:
+                # No Chromium o window handle é o id do alvo CDP: o canal segue o separador do Selenium
+                handle = self.driver.current_window_handle
+            except Exception:
+                return None
+            self._cdp_channel = CdpChannel(self.DEBUG_PORT, target_id=handle)
+        return self._cdp_channel
+
+    def _reset_cdp_channel(self):
+        self._cdp_disabled = False
+        if self._cdp_channel is not None:
+            self._cdp_channel.close()
+            self._cdp_channel = None
+
+    def _run_on_cdp(self, run, idempotent: bool) -> Tuple[bool, Any]:
+        # Devolve (True, valor) se correu no canal CDP; (False, None) para usar o WebDriver
+        channel = self._cdp()
+        if channel is None:
+            return False, None
+        try:
+            return True, run(channel)
+        except CdpTimeout as e:
+            raise TimeoutException(str(e))
+        except CdpScriptError as e:
+            raise JavascriptException(str(e))
+        except CdpError as e:
+            if e.request_sent and not idempotent:
+                raise WebDriverException(str(e))
+            if not e.request_sent:
+                # Não foi possível ligar (ex: porta sem acesso): fica no WebDriver até à próxima injeção
+                self._cdp_disabled = True
+                self.logger.info(f"Canal CDP indisponível, a usar WebDriver: {e}", source=SOURCE)
+            return False, None
+
+    def _execute_async(self, script: str, *args, timeout: Optional[int] = None, idempotent: bool = True) -> Any:
+        # Sem timeout explícito usa o SCRIPT_TIMEOUT já definido no driver
+        ran, value = self._run_on_cdp(
+            lambda channel: channel.run_async_script(script, *args, timeout=timeout or self.SCRIPT_TIMEOUT),
+            idempotent
+        )
+        if ran:
+            return value
+        if timeout is None:
+            return self.driver.execute_async_script(script, *args)
+        return self._safe_async_script(script, *args, timeout=timeout)
+
+    def _execute_sync(self, script: str, *args) -> Any:
+        ran, value = self._run_on_cdp(lambda channel: channel.run_script(script, *args), True)
+        if ran:
+            return value
+        return self.driver.execute_script(script, *args)
+
     def _safe_async_script(self, script: str, *args, timeout: int = 20) -> Any:
         if not self.driver:
             raise Exception("Driver não disponível")
@@ -434,6 +1252,223 @@ class WhatsAppSender:
             except:
                 pass
 
+    def _send_checked(self, phone_id: str, message: str) -> dict:
+        self.page_needs_recovery = self.send_retryable = False
+        try:
+            # Com os eventos ativos o PARAR já chega por poll_opt_outs: sem leitura do histórico
+            outcome = self._run_send_checked(phone_id, message, check_stop=not self._opt_out_listening) or {}
+        except TimeoutException:
+            raise
+        except WebDriverException as e:
+            # Janela fechada/página desligada: o resultado perdeu-se, não é seguro repetir.
+            # Com o driver morto não há página a recuperar (só inflacionava page_recoveries)
+            self.page_needs_recovery = self._driver_alive()
+            return {"status": "driver_error", "error": str(e).splitlines()[0][:100]}
+        
+        # Nada foi enviado: a recuperação (até ~55s) fica fora do prazo deste envio
+        self.page_needs_recovery = self.send_retryable = outcome.get('status') in self.RECOVERABLE_STATUSES
+        return outcome
+
+    def _run_send_checked(self, phone_id: str, message: str, check_stop: bool = True) -> Optional[dict]:
+        script = """
+            var callback = arguments[arguments.length - 1];
+            if (!window.__cmHelper) {
+                callback({status: 'no_helper'});
+                return;
+            }
+            window.__cmHelper.sendChecked(arguments[0], arguments[1], arguments[2])
+                .then(callback)
+                .catch(function(err) { callback({status: 'error', error: String(err)}); });
+        """
+        opts = {
+            "checkStop": check_stop,
+            "timeouts": {
+                "exists": self.EXISTS_TIMEOUT * 1000,
+                "history": self.HISTORY_TIMEOUT * 1000,
+                "send": self.SEND_TIMEOUT * 1000,
+            }
+        }
+        # Não idempotente: se a ligação cair depois do pedido, a mensagem pode ter saído
+        return self._execute_async(script, phone_id, message, opts, idempotent=False)
+
+    def poll_opt_outs(self) -> Set[str]:
+        # Recolhe os eventos da página desde a última chamada (PARAR e confirmações de entrega);
+        # devolve só os números novos que pediram para parar (incluindo os recolhidos antes de uma reciclagem)
+        self._drain_page_events()
+        new_numbers, self._new_opt_outs = self._new_opt_outs, set()
+        return new_numbers
+
+    def _drain_page_events(self):
+        if self.driver is None:
+            return
+        script = """
+            if (!window.__cmHelper || !window.__cmHelper.watchEvents) {
+                return null;
+            }
+            // Documento novo (recarregamento): volta a subscrever
+            var watching = window.__cmHelper.watchEvents();
+            var events = window.__cmHelper.drainEvents(arguments[0]);
+            events.watching = watching;
+            return events;
+        """
+        try:
+            # Repetir é seguro: a página só descarta os eventos confirmados na recolha seguinte
+            drained = self._execute_sync(script, self._events_confirmed)
+        except Exception as e:
+            self.logger.debug(f"Erro ao recolher pedidos de paragem: {str(e)[:100]}", source=SOURCE)
+            return
+        if not drained:
+            self._opt_out_listening = False
+            return
+        
+        self._opt_out_listening = bool(drained.get('watching'))
+        self._events_confirmed = {"doc": drained.get('doc'), "seq": drained.get('seq', 0)}
+        for msg_id, ack in (drained.get('acks') or {}).items():
+            self._pending_acks[msg_id] = max(self._pending_acks.get(msg_id, 0), int(ack))
+        
+        new_numbers: Set[str] = set()
+        for item in drained.get('optOuts') or []:
+            chat_id = str(item.get('id', ''))
+            if not chat_id.endswith('@c.us'):
+                # LID sem número associado: não há como o ligar a um contacto
+                self.logger.debug(f"PARAR de {chat_id} sem número de telefone", source=SOURCE)
+                continue
+            digits = chat_id.split('@')[0]
+            if digits not in self._opted_out:
+                new_numbers.add(digits)
+        
+        if new_numbers:
+            self._opted_out.update(new_numbers)
+            self._new_opt_outs.update(new_numbers)
+            self.logger.info(f"{len(new_numbers)} pedido(s) de paragem recebido(s)", source=SOURCE)
+
+    def scan_opt_outs(self, max_chats: Optional[int] = None, max_age_days: Optional[int] = None) -> Set[str]:
+        # Uma passagem na página por todas as conversas recentes: devolve quem respondeu PARAR por último
+        if self.driver is None:
+            return set()
+        
+        max_age_days = self.OPT_OUT_SCAN_DAYS if max_age_days is None else max_age_days
+        opts = {
+            "maxChats": max_chats or self.OPT_OUT_SCAN_MAX_CHATS,
+            "sinceSeconds": int(time.time() - max_age_days * 86400) if max_age_days else 0,
+            "concurrency": self.VALIDATE_CONCURRENCY,
+            "timeoutMs": self.HISTORY_TIMEOUT * 1000,
+        }
+        script = """
+            var callback = arguments[arguments.length - 1];
+            if (!window.__cmHelper || !window.__cmHelper.scanOptOuts) {
+                callback(null);
+                return;
+            }
+            window.__cmHelper.scanOptOuts(arguments[0])
+                .then(callback)
+                .catch(function(err) { callback({error: String(err)}); });
+        """
+        started = time.monotonic()
+        try:
+            scan = self._execute_async(script, opts, timeout=self.OPT_OUT_SCAN_TIMEOUT)
+            if scan is None and self._recover_page():
+                scan = self._execute_async(script, opts, timeout=self.OPT_OUT_SCAN_TIMEOUT)
+        except Exception as e:
+            self.logger.warning(f"Erro ao procurar pedidos de paragem: {str(e)[:100]}", source=SOURCE)
+            return set()
+        
+        if not scan or scan.get('error'):
+            self.logger.warning(f"Procura de pedidos de paragem indisponível: {(scan or {}).get('error', 'API indisponível')}", source=SOURCE)
+            return set()
+        
+        numbers: Set[str] = set()
+        for chat_id in scan.get('found') or []:
+            chat_id = str(chat_id)
+            if chat_id.endswith('@c.us'):
+                numbers.add(chat_id.split('@')[0])
+        self._opted_out.update(numbers)
+        
+        self.logger.info(
+            f"Procura de PARAR: {scan.get('scanned', 0)} conversa(s), {len(numbers)} pedido(s) de paragem "
+            f"({scan.get('fetched', 0)} histórico(s) pedidos, {scan.get('errors', 0)} erro(s), "
+            f"{time.monotonic() - started:.1f}s)",
+            source=SOURCE
+        )
+        return numbers
+
+    def take_acks(self) -> Dict[str, int]:
+        # Confirmações juntas pela última recolha de eventos (sem nova chamada à página)
+        acks, self._pending_acks = self._pending_acks, {}
+        return acks
+
+    def get_stop_responders(self) -> Set[str]:
+        # Só lê o acumulado: não usa o driver nem consome os novos à espera da campanha em curso
+        # (o ciclo de envio recolhe os eventos da página antes do primeiro envio)
+        return set(self._opted_out)
+
+    def validate_numbers(self, phones: List[str], concurrency: Optional[int] = None) -> Dict[str, Optional[bool]]:
+        # Devolve {dígitos: True (tem WhatsApp) / False (inválido) / None (sem resposta)}
+        results: Dict[str, Optional[bool]] = {}
+        if self.driver is None:
+            return results
+        
+        concurrency = concurrency or self.VALIDATE_CONCURRENCY
+        pending: List[str] = []
+        for phone in phones:
+            digits = self._format_phone(phone).split('@')[0]
+            if digits in results:
+                continue
+            if digits in self._invalid_numbers:
+                results[digits] = False
+            else:
+                results[digits] = None
+                pending.append(digits)
+        
+        for start in range(0, len(pending), self.VALIDATE_CHUNK):
+            chunk = pending[start:start + self.VALIDATE_CHUNK]
+            script = """
+                var callback = arguments[arguments.length - 1];
+                if (!window.__cmHelper) {
+                    callback(null);
+                    return;
+                }
+                window.__cmHelper.validateMany(arguments[0], arguments[1], arguments[2])
+                    .then(callback)
+                    .catch(function(err) { callback(null); });
+            """
+            # Pior caso: cada vaga de pedidos esgota o seu prazo
+            waves = math.ceil(len(chunk) / concurrency)
+            timeout = waves * self.EXISTS_TIMEOUT + 10
+            
+            try:
+                chunk_results = self._execute_async(
+                    script, [f"{d}@c.us" for d in chunk], concurrency, self.EXISTS_TIMEOUT * 1000,
+                    timeout=timeout
+                )
+            except Exception as e:
+                self.logger.warning(f"Erro na validação em lote: {e}", source=SOURCE)
+                continue
+            
+            if chunk_results is None:
+                self.logger.warning("Biblioteca auxiliar indisponível para validação em lote", source=SOURCE)
+                if not self._recover_page():
+                    break
+                continue
+            
+            invalid_digits = []
+            for item in chunk_results:
+                digits = str(item.get('phone', '')).split('@')[0]
+                exists = item.get('exists')
+                results[digits] = exists
+                if exists is False:
+                    invalid_digits.append(digits)
+            # Uma escrita da cache por lote, não uma por número
+            self._invalid_numbers.add_many(invalid_digits)
+        
+        invalid = sum(1 for v in results.values() if v is False)
+        unknown = sum(1 for v in results.values() if v is None)
+        self.logger.info(
+            f"Validação em lote: {len(results)} número(s), {invalid} inválido(s), {unknown} sem resposta",
+            source=SOURCE
+        )
+        return results
+
     def verify_stop_and_send(self, phone: str, message: str, contact_name: str = "", message_type: messageType = messageType.GENERAL) -> Result:
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         phone_id = self._format_phone(phone)
@@ -448,100 +1483,48 @@ class WhatsAppSender:
         try:
             self.logger.debug(f"Processando: {clean_phone}", source=SOURCE)
             
-            # Verificar se número existe
-            exists_script = """
-                var callback = arguments[arguments.length - 1];
-                try {
-                    WPP.contact.queryExists(arguments[0])
-                        .then(function(result) { callback(result); })
-                        .catch(function(err) { callback(null); });
-                } catch(e) {
-                    callback(null);
-                }
-            """
+            # Validação, verificação de PARAR e envio numa única chamada à página
+            outcome = self._send_checked(phone_id, message)
+            status = outcome.get('status')
             
-            try:
-                contact_info = self._safe_async_script(exists_script, phone_id, timeout=15)
-            except TimeoutException:
-                self.logger.warning(f"Timeout ao verificar número: {clean_phone}", source=SOURCE)
-                return Result(contact_name, clean_phone, statusType.INVALID, "Número Inválido (Timeout)", timestamp, message_type)
-            except Exception as e:
-                self.logger.warning(f"Erro ao verificar número: {clean_phone} - {e}", source=SOURCE)
-                return Result(contact_name, clean_phone, statusType.INVALID, "Número Inválido (Erro)", timestamp, message_type)
+            if status in self.UNSENT_STATUSES or status == 'driver_error':
+                # Falha da infraestrutura: nunca marca o número como inválido
+                detail = outcome.get('error') or status
+                self.logger.error(f"API do WhatsApp indisponível para {clean_phone}: {detail}", source=SOURCE)
+                return Result(contact_name, clean_phone, statusType.ERROR, f"API indisponível ({detail})", timestamp, message_type)
             
-            if not contact_info:
+            if outcome.get('historyError'):
+                self.logger.warning(f"Erro ao verificar histórico: {outcome['historyError']}", source=SOURCE)
+            
+            if status == 'invalid':
                 self.logger.info(f"Número inválido: {clean_phone}", source=SOURCE)
                 return Result(contact_name, clean_phone, statusType.INVALID, "Número Inválido", timestamp, message_type)
-
-            actual_id = phone_id
-            try:
-                actual_id = contact_info.get('wid', {}).get('_serialized', phone_id)
-            except:
-                pass
-                
-            self.logger.debug(f"Número válido: {actual_id}", source=SOURCE)
-
-            # Verificar última mensagem (PARAR)
-            hist_script = """
-                var callback = arguments[arguments.length - 1];
-                try {
-                    WPP.chat.getMessages(arguments[0], {count: 10})
-                        .then(function(msgs) {
-                            var received = msgs.filter(function(m) { return !m.fromMe; }).reverse();
-                            if (received.length > 0) {
-                                callback(received[0].body || received[0].content || '');
-                            } else {
-                                callback(null);
-                            }
-                        })
-                        .catch(function(err) { callback(null); });
-                } catch(e) {
-                    callback(null);
-                }
-            """
             
-            try:
-                last_msg = self._safe_async_script(hist_script, actual_id, timeout=15)
-                
-                if last_msg and str(last_msg).strip().upper() == "PARAR":
-                    self.logger.info(f"Parar detectado: {clean_phone}", source=SOURCE)
-                    return Result(contact_name, clean_phone, statusType.ERROR, "PARAR Detectado", timestamp, message_type)
-            except Exception as e:
-                self.logger.warning(f"Erro ao verificar histórico: {e}", source=SOURCE)
-
-            # Enviar mensagem
-            self.logger.debug(f"Enviando mensagem...", source=SOURCE)
-            send_script = """
-                var callback = arguments[arguments.length - 1];
-                try {
-                    WPP.chat.sendTextMessage(arguments[0], arguments[1])
-                        .then(function(result) { 
-                            callback({success: true, result: result}); 
-                        })
-                        .catch(function(err) { 
-                            callback({success: false, error: String(err)}); 
-                        });
-                } catch(e) {
-                    callback({success: false, error: String(e)});
-                }
-            """
-            
-            result = self._safe_async_script(send_script, actual_id, message, timeout=20)
+            if status == 'stopped':
+                self.logger.info(f"Parar detectado: {clean_phone}", source=SOURCE)
+                return Result(contact_name, clean_phone, statusType.ERROR, "PARAR Detectado", timestamp, message_type)
             
-            if result and result.get('success'):
+            if status == 'sent':
                 self.logger.info(f"Enviado para: {clean_phone}", source=SOURCE)
-                return Result(contact_name, clean_phone, statusType.SUCCESS, "Enviado", timestamp, message_type)
-            else:
-                err = result.get('error') if result else "Erro desconhecido"
-                err_str = str(err).lower()
-                
-                # Erros que indicam número inválido/sem WhatsApp
-                if any(x in err_str for x in ['no lid for user', 'lid', 'not found', 'does not exist']):
-                    self.logger.warning(f"Número inválido/sem WhatsApp: {clean_phone} - {err}", source=SOURCE)
-                    return Result(contact_name, clean_phone, statusType.INVALID, f"Número Inválido: {err}", timestamp, message_type)
-                
-                self.logger.error(f"Erro ao enviar: {err}", source=SOURCE)
-                return Result(contact_name, clean_phone, statusType.ERROR, f"Erro: {err}", timestamp, message_type)
+                return Result(
+                    contact_name, clean_phone, statusType.SUCCESS, "Enviado", timestamp, message_type,
+                    message_id=outcome.get('msgId') or ""
+                )
+            
+            err = outcome.get('error') or "Erro desconhecido"
+            if err == 'timeout':
+                self.logger.error(f"Timeout para: {clean_phone}", source=SOURCE)
+                return Result(contact_name, clean_phone, statusType.ERROR, "Timeout", timestamp, message_type)
+            
+            err_str = str(err).lower()
+            
+            # Erros que indicam número inválido/sem WhatsApp
+            if re.search(r'no lid for user|\blid\b|not found|does not exist', err_str):
+                self.logger.warning(f"Número inválido/sem WhatsApp: {clean_phone} - {err}", source=SOURCE)
+                return Result(contact_name, clean_phone, statusType.INVALID, f"Número Inválido: {err}", timestamp, message_type)
+            
+            self.logger.error(f"Erro ao enviar: {err}", source=SOURCE)
+            return Result(contact_name, clean_phone, statusType.ERROR, f"Erro: {err}", timestamp, message_type)
 
         except TimeoutException:
             self.logger.error(f"Timeout para: {clean_phone}", source=SOURCE)
@@ -550,15 +1533,39 @@ class WhatsAppSender:
             self.logger.error(f"Erro: {e}", source=SOURCE)
             return Result(contact_name, clean_phone, statusType.ERROR, str(e)[:100], timestamp, message_type)
 
+    def release_browser(self):
+        # Termina só o msedgedriver: o Edge continua aberto para ser reutilizado
+        if self.driver is None:
+            return
+        try:
+            self.driver.service.stop()
+            self.logger.info("Navegador mantido aberto para a próxima sessão", source=SOURCE)
+        except Exception as e:
+            self.logger.warning(f"Erro ao libertar o driver: {e}", source=SOURCE)
+        self._reset_cdp_channel()
+        self._processes.forget("driver")
+        self.driver = None
+        self._attached = False
+
     def close(self):
         self.logger.info("Encerrando navegador...", source=SOURCE)
+        self._reset_cdp_channel()
         if self.driver:
+            if self._attached:
+                # O quit de um driver ligado não fecha o navegador
+                try:
+                    self.driver.execute_cdp_cmd("Browser.close", {})
+                except Exception:
+                    pass
             try: 
                 self.driver.quit()
                 self.logger.info("Navegador encerrado", source=SOURCE)
             except Exception as e:
                 self.logger.error(f"Erro ao encerrar: {e}", source=SOURCE)
+        # Garante que nada fica para trás (o quit pode falhar com o navegador bloqueado)
+        self._processes.terminate_all()
         self.driver = None
+        self._attached = False
 
 if __name__ == "__main__":
     print("Teste do WhatsApp Sender")    
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+import requests
+from utils.logger import get_logger
+
+SOURCE = "WppBundleCache"
+
+class WppBundleCache:
+    BUNDLE_FILE = "wppconnect-wa.js"
+    META_FILE = "wppconnect-wa.meta.json"
+    # Cópia fixa (ex: versão testada); quando existe é sempre usada, sem rede
+    PINNED_FILE = "wppconnect-wa.pinned.js"
+
+    def __init__(self, directory: Path, url: str, max_age_hours: float = 24, timeout: int = 30):
+        self.directory = Path(directory)
+        self.url = url
+        self.max_age = timedelta(hours=max_age_hours)
+        self.timeout = timeout
+        self.logger = get_logger()
+
+    @property
+    def bundle_path(self) -> Path:
+        return self.directory / self.BUNDLE_FILE
+
+    @property
+    def meta_path(self) -> Path:
+        return self.directory / self.META_FILE
+
+    @property
+    def pinned_path(self) -> Path:
+        return self.directory / self.PINNED_FILE
+
+    @staticmethod
+    def _hash(content: bytes) -> str:
+        return hashlib.sha256(content).hexdigest()
+
+    def _read_meta(self) -> dict:
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _write_atomic(self, path: Path, content: bytes):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def _write_meta(self, meta: dict):
+        self._write_atomic(self.meta_path, json.dumps(meta, ensure_ascii=False, indent=2).encode('utf-8'))
+
+    def _read_cached(self, meta: dict) -> Optional[str]:
+        if not self.bundle_path.exists():
+            return None
+        try:
+            content = self.bundle_path.read_bytes()
+        except Exception as e:
+            self.logger.warning(f"Erro ao ler WPP.js em cache: {e}", source=SOURCE)
+            return None
+
+        # Ficheiro truncado ou alterado: não é usado
+        if meta.get("sha256") != self._hash(content):
+            self.logger.warning("WPP.js em cache corrompido, será descarregado novamente", source=SOURCE)
+            return None
+        return content.decode('utf-8')
+
+    def _is_fresh(self, meta: dict) -> bool:
+        try:
+            checked_at = datetime.fromisoformat(meta.get("checked_at", ""))
+        except ValueError:
+            return False
+        return datetime.now() - checked_at < self.max_age
+
+    def get(self, force_revalidate: bool = False) -> Optional[str]:
+        if self.pinned_path.exists():
+            try:
+                content = self.pinned_path.read_text(encoding='utf-8')
+                self.logger.info(f"A usar WPP.js fixo: {self.pinned_path}", source=SOURCE)
+                return content
+            except Exception as e:
+                self.logger.warning(f"Erro ao ler WPP.js fixo: {e}", source=SOURCE)
+
+        meta = self._read_meta()
+        cached = self._read_cached(meta) if meta else None
+
+        if cached is not None and not force_revalidate and self._is_fresh(meta):
+            self.logger.debug(f"WPP.js em cache ({meta.get('sha256', '')[:12]})", source=SOURCE)
+            return cached
+
+        return self._revalidate(meta, cached)
+
+    def _revalidate(self, meta: dict, cached: Optional[str]) -> Optional[str]:
+        headers = {}
+        if cached is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        self.logger.info("A verificar atualizações do WPP.js...", source=SOURCE)
+        try:
+            response = requests.get(self.url, headers=headers, timeout=self.timeout)
+
+            if response.status_code == 304 and cached is not None:
+                meta["checked_at"] = datetime.now().isoformat(timespec="seconds")
+                self._write_meta(meta)
+                self.logger.info("WPP.js em cache está atualizado", source=SOURCE)
+                return cached
+
+            response.raise_for_status()
+            content = response.content
+            digest = self._hash(content)
+
+            self._write_atomic(self.bundle_path, content)
+            now = datetime.now().isoformat(timespec="seconds")
+            self._write_meta({
+                "url": self.url,
+                "sha256": digest,
+                "size": len(content),
+                "etag": response.headers.get("ETag", ""),
+                "last_modified": response.headers.get("Last-Modified", ""),
+                "downloaded_at": now,
+                "checked_at": now,
+            })
+
+            changed = "atualizado" if digest != meta.get("sha256") else "sem alterações"
+            self.logger.info(f"WPP.js baixado ({len(content)} bytes, {changed})", source=SOURCE)
+            return content.decode('utf-8')
+
+        except Exception as e:
+            if cached is not None:
+                # Sem rede: a cópia anterior continua a servir
+                self.logger.warning(f"Falha ao verificar WPP.js, a usar cache: {e}", source=SOURCE)
+                return cached
+            self.logger.error(f"Erro ao baixar WPP.js: {e}", source=SOURCE)
+            return None
+
+    def pin_current(self) -> bool:
+        # Fixa a versão atualmente em cache para arranques sem rede
+        meta = self._read_meta()
+        cached = self._read_cached(meta)
+        if cached is None:
+            return False
+        self._write_atomic(self.pinned_path, cached.encode('utf-8'))
+        self.logger.info(f"WPP.js fixado ({meta.get('sha256', '')[:12]})", source=SOURCE)
+        return True
+
+    def unpin(self):
+        if self.pinned_path.exists():
+            self.pinned_path.unlink()
@@ -42,6 +42,7 @@ hidden_imports.extend([
     'selenium.webdriver.edge',
     'selenium.webdriver.chrome',
     'selenium.webdriver.firefox',
+    'websocket',
     'webdriver_manager',
     'PIL',
     'urllib3',
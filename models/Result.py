@@ -9,6 +9,13 @@ class statusType(Enum):
 class messageType(Enum):
     WELCOME = "boas-vindas"
     GENERAL = "geral"
+
+class ackType(Enum):
+    # Valores do WhatsApp para o estado de entrega de uma mensagem
+    SENT = 1
+    DELIVERED = 2
+    READ = 3
+    PLAYED = 4
     
 @dataclass
 class Result:
@@ -17,4 +24,45 @@ class Result:
     status: statusType  # 'sucesso', 'erro', 'inválido'
     message: str
     timestamp: str
-    message_type: messageType  # 'boas-vindas' ou 'geral'
\ No newline at end of file
+    message_type: messageType  # 'boas-vindas' ou 'geral'
+    message_id: str = ""  # Id da mensagem no WhatsApp (vazio no SMS)
+    ack: int = 0  # Maior confirmação recebida (ackType), 0 = sem confirmação
+
+    @property
+    def delivered(self) -> bool:
+        return self.ack >= ackType.DELIVERED.value
+
+    @property
+    def read(self) -> bool:
+        return self.ack >= ackType.READ.value
+
+    def update_ack(self, ack: int) -> bool:
+        # Os eventos podem chegar fora de ordem: só avança
+        previous = self.ack
+        self.ack = max(self.ack, int(ack))
+        return self.ack != previous
+
+    def to_dict(self) -> dict:
+        return {
+            "contact_name": self.contact_name,
+            "contact_phone": self.contact_phone,
+            "status": self.status.value,
+            "message": self.message,
+            "timestamp": self.timestamp,
+            "message_type": self.message_type.value,
+            "message_id": self.message_id,
+            "ack": self.ack,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Result':
+        return cls(
+            contact_name=data.get("contact_name", ""),
+            contact_phone=data.get("contact_phone", ""),
+            status=statusType(data.get("status", statusType.ERROR.value)),
+            message=data.get("message", ""),
+            timestamp=data.get("timestamp", ""),
+            message_type=messageType(data.get("message_type", messageType.GENERAL.value)),
+            message_id=data.get("message_id", ""),
+            ack=data.get("ack", 0),
+        )
@@ -3,6 +3,7 @@ from typing import List, Callable, Optional
 from views.base.base_list_window import BaseListWindow
 from views.windows.add_contact_window import AddContactWindow
 from models.contact import Contact
+from controllers.services.invalid_number_cache import InvalidNumberCache
 from tkinter import messagebox
 
 class ContactEditorWindow(BaseListWindow):
@@ -11,12 +12,14 @@ class ContactEditorWindow(BaseListWindow):
         parent: ctk.CTk,
         contacts: List[Contact],
         on_save: Optional[Callable] = None,
-        send_all_mode: bool = False  # Novo parâmetro
+        send_all_mode: bool = False,  # Novo parâmetro
+        invalid_numbers: Optional[InvalidNumberCache] = None
     ):
         self._on_save = on_save
         self._modified = False
         self._editing_row = False  # Flag para controlar edição de linha
         self._send_all_mode = send_all_mode  # Guarda o modo
+        self._invalid_numbers = invalid_numbers  # Números sem WhatsApp conhecidos
         
         columns = [
             {"title": "Nome", "key": "nome", "weight": 1, "editable": True, "min_width": 200},
@@ -80,7 +83,11 @@ class ContactEditorWindow(BaseListWindow):
     def _get_stats_text(self) -> str:
         total = len(self.data)
         active = sum(1 for c in self.data if c.ativo)
-        return f"Total: {total} | Ativos: {active}"
+        text = f"Total: {total} | Ativos: {active}"
+        if self._invalid_numbers is not None:
+            invalid = sum(1 for c in self.data if self._invalid_numbers.is_invalid(c.telemovel))
+            text += f" | Sem WhatsApp: {invalid}"
+        return text
     
     def _get_row_color(self, item: Contact) -> str:
         # Se estiver no modo "Enviar para Todos", ignora o campo 'selecionado'
@@ -95,6 +102,12 @@ class ContactEditorWindow(BaseListWindow):
     
     def _on_contact_edited(self, row_idx: int, key: str, old_val, new_val):
         self._modified = True
+        
+        # Número alterado para um que está na cache de inválidos: passa logo a inválido
+        if key == "telemovel" and self._invalid_numbers is not None:
+            contact = self.data[row_idx]
+            if contact.is_valid and self._invalid_numbers.is_invalid(contact.telemovel):
+                contact.is_valid = False
         self._update_stats()
         
         if key in ("ativo", "selecionado"):
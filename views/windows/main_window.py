@@ -1,4 +1,5 @@
 import customtkinter as ctk
+import threading
 from typing import Optional, List
 from pathlib import Path
 from datetime import datetime
@@ -10,10 +11,13 @@ from views.windows.selection_window import ContactSelectionWindow
 from models.contact import Contact
 from config.settings import ThemeManager
 from controllers.contact_controller import ContactController
+from controllers.campaign_scheduler import CampaignScheduler
 from controllers.services.data_handler import DataHandler
 from controllers.services.contact_service import ContactService
 from controllers.services.config_service import ConfigService
 from controllers.services.message_service import MessageService
+from controllers.services.job_queue import JobQueue, CampaignJob
+from controllers.services.preflight_service import SendPlan
 from utils.environment import get_base_dir
 import tkinter as tk
 
@@ -27,13 +31,18 @@ class MainWindow(BaseMainWindow):
         self.config_service = ConfigService.create_default_config(get_base_dir())
         self.message_service = MessageService()
         self.controller.set_message_service(self.message_service)
+        self.scheduler = CampaignScheduler(
+            self.controller,
+            JobQueue(get_base_dir() / "data" / "jobs.db")
+        )
         self.is_sending = False
         self.selected_contacts: List[Contact] = []
         self.controller.set_callbacks(
             on_contacts_changed=self._on_contacts_changed,
             on_send_progress=self._on_send_progress,
             on_send_complete=self._on_send_complete,
-            on_log=self._log
+            on_log=self._log,
+            on_pacing_update=self._on_pacing_update
         )
         super().__init__(
             title=self.theme.settings.app_name,
@@ -288,6 +297,11 @@ class MainWindow(BaseMainWindow):
         self.stop_btn = ctk.CTkButton(btns, text="Parar", width=100, height=40, font=("Segoe UI", 12), fg_color="red", state="disabled", command=self._stop_sending)
         self.stop_btn.pack(side="left", padx=5)
         
+        self.resume_btn = ctk.CTkButton(btns, text="Retomar", width=100, height=40, font=("Segoe UI", 12), command=self._resume_campaign)
+        self.resume_btn.pack(side="left", padx=5)
+        
+        ctk.CTkButton(btns, text="Agendar", width=100, height=40, font=("Segoe UI", 12), command=self._schedule_campaign).pack(side="left", padx=5)
+        
         # Progress
         self.progress = ctk.CTkProgressBar(frame)
         self.progress.grid(row=1, column=0, sticky="ew", padx=10, pady=(0, 5))
@@ -296,6 +310,9 @@ class MainWindow(BaseMainWindow):
         self.status_label = ctk.CTkLabel(frame, text="Pronto", font=("Segoe UI", 12), text_color="gray")
         self.status_label.grid(row=2, column=0, sticky="w", padx=10, pady=(0, 5))
         
+        self.pacing_label = ctk.CTkLabel(frame, text="", font=("Segoe UI", 11), text_color="gray")
+        self.pacing_label.grid(row=3, column=0, sticky="w", padx=10, pady=(0, 5))
+        
         return row + 1
     
     def _build_log_section(self, row: int) -> int:
@@ -529,7 +546,8 @@ class MainWindow(BaseMainWindow):
                 self, 
                 self.service.contacts, 
                 on_save,
-                send_all_mode=self.send_all_var.get()  # Passa o modo atual
+                send_all_mode=self.send_all_var.get(),  # Passa o modo atual
+                invalid_numbers=self.controller.get_invalid_number_cache()
             )
         except Exception as e:
             self._log(f"Erro ao abrir editor: {e}")
@@ -595,6 +613,11 @@ class MainWindow(BaseMainWindow):
 
     def _start_sending(self):
         # Validações
+        if self.controller.is_sending:
+            # Ex: campanha agendada a correr; o plano usaria o sender ao mesmo tempo
+            self._log("Já existe um envio em progresso")
+            return
+        
         if not self.service.contacts:
             from tkinter import messagebox
             messagebox.showerror("Erro", "Carregue contactos primeiro")
@@ -605,6 +628,7 @@ class MainWindow(BaseMainWindow):
         
         method = self.method_var.get()
         delay = int(self.delay_slider.get())
+        daily_cap = self.config_service.get("daily_cap", {}).get(method)
         
         # Determina contactos elegíveis
         send_all_mode = self.send_all_var.get()
@@ -615,20 +639,164 @@ class MainWindow(BaseMainWindow):
             self._log(f"Nenhum contacto elegível em {mode}")
             return
         
-        # Atualiza UI
-        self.is_sending = True
+        # Plano de envio: usa o navegador/ADB, por isso é feito fora da thread da interface
+        check_stop_response = (method == "whatsapp")
         self.start_btn.configure(state="disabled")
-        self.stop_btn.configure(state="normal")
+        self._log("A preparar o plano de envio...")
+        
+        def plan_thread():
+            try:
+                plan = self.controller.build_send_plan(contacts_to_send, check_stop_response)
+            except Exception as e:
+                error = f"Erro ao preparar o plano de envio: {e}"
+                self.after(0, lambda: self._log(error))
+                self.after(0, lambda: self.start_btn.configure(state="normal"))
+                return
+            self.after(0, lambda: self._confirm_send_plan(
+                plan, method, contacts_to_send, message_template, welcome_template,
+                delay, check_stop_response, daily_cap
+            ))
+        
+        threading.Thread(target=plan_thread, daemon=True).start()
+    
+    def _confirm_send_plan(
+        self,
+        plan: SendPlan,
+        method: str,
+        contacts_to_send: List[Contact],
+        message_template: str,
+        welcome_template: str,
+        delay: int,
+        check_stop_response: bool,
+        daily_cap: Optional[int]
+    ):
+        # Mostra o que vai ser excluído antes de começar
+        if plan.excluded:
+            from tkinter import messagebox
+            self._log(plan.summary())
+            if not plan.to_send:
+                messagebox.showwarning("Plano de Envio", plan.summary())
+                self.start_btn.configure(state="normal")
+                return
+            if not messagebox.askyesno("Plano de Envio", f"{plan.summary()}\n\nContinuar?"):
+                self.start_btn.configure(state="normal")
+                return
+        
+        # Campanha por concluir: retomar ou descartar (os envios já feitos passam para os contactos)
+        pending = self.controller.get_pending_campaign()
+        if pending:
+            from tkinter import messagebox
+            answer = messagebox.askyesnocancel(
+                "Campanha por Concluir",
+                f"Existe uma campanha {pending['method'].upper()} iniciada em {pending['created_at']}\n"
+                f"({pending['finished']}/{pending['total']} contactos processados).\n\n"
+                "Sim: retomar essa campanha (a nova não é iniciada)\n"
+                "Não: descartá-la e iniciar a nova"
+            )
+            if answer is None:
+                self.start_btn.configure(state="normal")
+                return
+            if answer:
+                if self.controller.resume_campaign():
+                    self.is_sending = True
+                    self.stop_btn.configure(state="normal")
+                else:
+                    self.start_btn.configure(state="normal")
+                return
+            self.controller.discard_pending_campaign()
         
         # Delega tudo para o controller
-        self.controller.start_sending(
+        started = self.controller.start_sending(
             method=method,
             contacts=contacts_to_send,
             message_template=message_template,
             welcome_template=welcome_template,
             delay=delay,
-            check_stop_response=(method == "whatsapp")
+            check_stop_response=check_stop_response,
+            daily_cap=daily_cap,
+            plan=plan
+        )
+        if not started:
+            self.start_btn.configure(state="normal")
+            return
+        
+        # Atualiza UI
+        self.is_sending = True
+        self.stop_btn.configure(state="normal")
+    
+    def _schedule_campaign(self):
+        if not self.service.contacts:
+            from tkinter import messagebox
+            messagebox.showerror("Erro", "Carregue contactos primeiro")
+            return
+        
+        method = self.method_var.get()
+        send_all_mode = self.send_all_var.get()
+        contacts_to_send = self._get_contacts_to_send(send_all_mode)
+        
+        if not contacts_to_send:
+            mode = "todos os contactos" if send_all_mode else "contactos selecionados"
+            self._log(f"Nenhum contacto elegível em {mode}")
+            return
+        
+        dialog = ctk.CTkInputDialog(
+            title="Agendar Campanha",
+            text="Janela horária (ex: 09:00-20:00)\nDeixe vazio para enviar a qualquer hora:"
         )
+        window = dialog.get_input()
+        if window is None:
+            return
+        
+        window_start, window_end = "", ""
+        window = window.strip()
+        if window:
+            parts = [p.strip() for p in window.split("-")]
+            # Mesma leitura do scheduler: uma hora que ele não entenda seria "sem restrição"
+            if len(parts) != 2 or any(CampaignJob._parse_time(p) is None for p in parts):
+                from tkinter import messagebox
+                messagebox.showerror("Erro", "Formato inválido. Use HH:MM-HH:MM")
+                return
+            window_start, window_end = parts
+        
+        job_id = self.scheduler.enqueue(
+            method=method,
+            contacts=contacts_to_send,
+            message_template=self.message_text.get("1.0", "end-1c").strip(),
+            welcome_template=self.welcome_text.get("1.0", "end-1c").strip(),
+            delay=int(self.delay_slider.get()),
+            check_stop_response=(method == "whatsapp"),
+            daily_cap=self.config_service.get("daily_cap", {}).get(method),
+            window_start=window_start,
+            window_end=window_end
+        )
+        pending = len(self.scheduler.queue.list_jobs())
+        self._log(f"Campanha #{job_id} agendada ({len(contacts_to_send)} contactos, {pending} na fila)")
+    
+    def _resume_campaign(self):
+        from tkinter import messagebox
+        
+        pending = self.controller.get_pending_campaign()
+        if not pending:
+            messagebox.showinfo("Retomar", "Não há nenhuma campanha por concluir")
+            return
+        
+        answer = messagebox.askyesnocancel(
+            "Retomar Campanha",
+            f"Campanha {pending['method'].upper()} iniciada em {pending['created_at']}\n"
+            f"{pending['finished']}/{pending['total']} contactos processados.\n\n"
+            "Sim: retomar (sem repetir envios já feitos)\n"
+            "Não: descartar a campanha"
+        )
+        if answer is None:
+            return
+        if answer is False:
+            self.controller.discard_pending_campaign()
+            return
+        
+        if self.controller.resume_campaign():
+            self.is_sending = True
+            self.start_btn.configure(state="disabled")
+            self.stop_btn.configure(state="normal")
     
     def _get_contacts_to_send(self, send_all_mode: bool) -> List[Contact]:
         if send_all_mode:
@@ -658,6 +826,15 @@ class MainWindow(BaseMainWindow):
             text=f"Enviando: {current}/{total}"
         ))
     
+    def _on_pacing_update(self, stats: dict):
+        eta = stats["eta"].strftime("%H:%M:%S")
+        cap = f"{stats['sent_today']}/{stats['daily_cap']}" if stats["daily_cap"] else f"{stats['sent_today']}"
+        text = (
+            f"Ritmo: {stats['rate_per_min']:.1f} msg/min (alvo {stats['target_rate_per_min']:.1f})"
+            f" | Conclusão prevista: {eta} | Hoje: {cap}"
+        )
+        self.after(0, lambda: self.pacing_label.configure(text=text))
+    
     def _on_send_complete(self, sent: int, failed: int, total: int):
         self.is_sending = False
         self.after(0, lambda: self.start_btn.configure(state="normal"))
@@ -723,6 +900,16 @@ class MainWindow(BaseMainWindow):
             
             # Carregar contactos e sheets automaticamente
             self._auto_load_contacts()
+            
+            self.controller.set_session_idle_timeout(config.get("whatsapp_idle_timeout_min", 30) * 60)
+            self.scheduler.start()
+            
+            pending = self.controller.get_pending_campaign()
+            if pending:
+                self._log(
+                    f"Campanha por concluir ({pending['finished']}/{pending['total']} contactos). "
+                    "Inicialize e use 'Retomar' para continuar."
+                )
             self.after(500, self._auto_load_sheets)
             
         except Exception as e:
@@ -730,7 +917,9 @@ class MainWindow(BaseMainWindow):
     
     def _save_config(self):
         try:
+            # Parte da configuração atual para não perder chaves que a UI não edita
             config = {
+                **self.config_service.load(),
                 "method": self.method_var.get(),
                 "delay": int(self.delay_slider.get()),
                 "message": self.message_text.get("1.0", "end-1c"),
@@ -766,6 +955,8 @@ class MainWindow(BaseMainWindow):
             self._load_excel()
     
     def _on_closing(self):
+        self.scheduler.stop()
+        self.controller.shutdown(keep_browser=self.config_service.get("whatsapp_keep_browser_on_exit", False))
         self._save_config()
         self._auto_save_contacts()
         
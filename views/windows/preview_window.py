@@ -2,6 +2,7 @@ import customtkinter as ctk
 from typing import List, Callable, Optional
 from views.base.base_list_window import BaseListWindow
 from models.contact import Contact
+from controllers.services.preview_provider import PreviewProvider
 
 
 class PreviewDashboardWindow(BaseListWindow):
@@ -16,7 +17,8 @@ class PreviewDashboardWindow(BaseListWindow):
         on_send_both: Optional[Callable] = None,
         on_confirm: Optional[Callable] = None,
         read_only: bool = False,
-        send_all_mode: bool = False  # Novo parâmetro
+        send_all_mode: bool = False,  # Novo parâmetro
+        page_size: int = PreviewProvider.DEFAULT_PAGE_SIZE
     ):
         self._on_send_welcome = on_send_welcome
         self._on_send_general = on_send_general
@@ -27,6 +29,12 @@ class PreviewDashboardWindow(BaseListWindow):
         self._mensagem_boas_vindas = mensagem_boas_vindas
         self._send_all_mode = send_all_mode  # Guarda o modo
         
+        # Só são criados widgets para a página atual; as mensagens são renderizadas a pedido
+        self._all_contacts = contacts
+        self._provider = PreviewProvider(contacts, mensagem_geral, mensagem_boas_vindas)
+        self._page = 0
+        self._page_size = max(1, page_size)
+        
         # Define colunas baseado no modo
         columns = [
             {"title": "Nome", "key": "nome", "weight": 1, "min_width": 200},
@@ -44,7 +52,7 @@ class PreviewDashboardWindow(BaseListWindow):
             title="Preview",
             size=(1000, 700),
             columns=columns,
-            data=contacts,
+            data=self._provider.get_page_contacts(0, self._page_size),
             mode=BaseListWindow.MODE_PREVIEW
         )
         
@@ -140,6 +148,31 @@ class PreviewDashboardWindow(BaseListWindow):
                 font=("", 10)
             ).pack(side="left", padx=8)
         
+        # Paginação
+        page_frame = ctk.CTkFrame(self.footer_frame, fg_color="transparent")
+        page_frame.pack(side="left", padx=10)
+        
+        self.prev_page_btn = ctk.CTkButton(
+            page_frame,
+            text="<",
+            width=30,
+            command=lambda: self._go_to_page(self._page - 1)
+        )
+        self.prev_page_btn.pack(side="left", padx=2)
+        
+        self.page_label = ctk.CTkLabel(page_frame, text="", font=("", 10))
+        self.page_label.pack(side="left", padx=5)
+        
+        self.next_page_btn = ctk.CTkButton(
+            page_frame,
+            text=">",
+            width=30,
+            command=lambda: self._go_to_page(self._page + 1)
+        )
+        self.next_page_btn.pack(side="left", padx=2)
+        
+        self._update_page_controls()
+        
         # Botões
         btn_frame = ctk.CTkFrame(self.footer_frame, fg_color="transparent")
         btn_frame.pack(side="right", padx=10)
@@ -200,40 +233,58 @@ class PreviewDashboardWindow(BaseListWindow):
 
         return color
     
+    def _go_to_page(self, page: int):
+        total_pages = self._provider.page_count(self._page_size)
+        page = max(0, min(page, total_pages - 1))
+        if page == self._page:
+            return
+        
+        self._page = page
+        self.refresh_data(self._provider.get_page_contacts(page, self._page_size))
+        self._update_page_controls()
+        self._select_first_contact()
+    
+    def _update_page_controls(self):
+        total_pages = self._provider.page_count(self._page_size)
+        start = self._page * self._page_size
+        end = min(start + self._page_size, len(self._all_contacts))
+        
+        self.page_label.configure(
+            text=f"{start + 1 if end else 0}-{end} de {len(self._all_contacts)}"
+        )
+        self.prev_page_btn.configure(state="normal" if self._page > 0 else "disabled")
+        self.next_page_btn.configure(state="normal" if self._page < total_pages - 1 else "disabled")
+    
     def _select_first_contact(self):
         if self.data and len(self.data) > 0:
             self._on_contact_selected(self.data[0])
     
     def _on_contact_selected(self, contact: Contact):
-        # Atualiza preview de boas-vindas - usa mensagem do parâmetro principal
+        general_text, welcome_text = self._provider.render(contact)
+        
+        # Atualiza preview de boas-vindas
         self.welcome_preview.configure(state="normal")
         self.welcome_preview.delete("1.0", "end")
-        welcome_text = self._mensagem_boas_vindas if self._mensagem_boas_vindas else "(Sem mensagem de boas-vindas)"
-        # Substitui {nome} pelo nome do contacto
-        welcome_text = welcome_text.replace("{nome}", contact.nome)
-        self.welcome_preview.insert("1.0", welcome_text)
+        self.welcome_preview.insert("1.0", welcome_text or "(Sem mensagem de boas-vindas)")
         self.welcome_preview.configure(state="disabled")
         
-        # Atualiza preview geral - usa mensagem do parâmetro principal
+        # Atualiza preview geral
         self.general_preview.configure(state="normal")
         self.general_preview.delete("1.0", "end")
-        general_text = self._mensagem_geral if self._mensagem_geral else "(Sem mensagem geral)"
-        # Substitui {nome} pelo nome do contacto
-        general_text = general_text.replace("{nome}", contact.nome)
-        self.general_preview.insert("1.0", general_text)
+        self.general_preview.insert("1.0", general_text or "(Sem mensagem geral)")
         self.general_preview.configure(state="disabled")
     
     def _send_welcome(self):
         if self._on_send_welcome:
-            eligible = [c for c in self.data if c.verificar_enviar_boas_vindas()]
+            eligible = [c for c in self._all_contacts if c.verificar_enviar_boas_vindas()]
             self._on_send_welcome(eligible)
     
     def _send_general(self):
         if self._on_send_general:
-            eligible = [c for c in self.data if c.verificar_enviar_mensagem_geral()]
+            eligible = [c for c in self._all_contacts if c.verificar_enviar_mensagem_geral()]
             self._on_send_general(eligible)
     
     def _send_both(self):
         if self._on_send_both:
-            eligible = [c for c in self.data if c.verificar_enviar_mensagem_geral()]
+            eligible = [c for c in self._all_contacts if c.verificar_enviar_mensagem_geral()]
             self._on_send_both(eligible)
\ No newline at end of file